@@ -0,0 +1,60 @@
+"""
+Benchmark `clean_time_cols` on synthetic EarthRanger-shaped observation payloads.
+
+Compares the vectorized ISO-8601 fast path against the previous row-wise `dateutil` parsing.
+
+    python benchmarks/bench_clean_time_cols.py --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil import parser
+
+from ecoscope.io.earthranger_utils import TIME_COLS, clean_time_cols
+
+
+def make_payload(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    recorded_at = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(
+        np.sort(rng.integers(0, 3 * 365 * 24 * 3600 * 10**6, rows)), unit="us"
+    )
+    created_at = recorded_at + pd.to_timedelta(rng.integers(0, 3600 * 10**6, rows), unit="us")
+
+    # ER serializes times in the site's timezone, with or without fractional seconds
+    offsets = rng.choice(["+03:00", "-07:00", "+00:00"], rows)
+    return pd.DataFrame(
+        {
+            "recorded_at": [t.strftime("%Y-%m-%dT%H:%M:%S") + o for t, o in zip(recorded_at, offsets)],
+            "created_at": [t.isoformat() for t in created_at],
+        }
+    )
+
+
+def clean_time_cols_rowwise(df):
+    for col in TIME_COLS:
+        if col in df.columns and not pd.api.types.is_datetime64_ns_dtype(df[col]):
+            df[col] = df[col].apply(lambda x: pd.to_datetime(parser.parse(x), utc=True) if not pd.isna(x) else None)
+    return df
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument("--rows", type=int, default=200_000)
+    args = argparser.parse_args()
+
+    payload = make_payload(args.rows)
+
+    results = {}
+    for name, func in [("vectorized", clean_time_cols), ("rowwise", clean_time_cols_rowwise)]:
+        start = time.perf_counter()
+        results[name] = func(payload.copy())
+        print(f"{name:>10}: {time.perf_counter() - start:.3f}s for {args.rows} rows")
+
+    pd.testing.assert_frame_equal(results["vectorized"], results["rowwise"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark `EarthRangerIO` and `AsyncEarthRangerIO` end to end, from HTTP requests to `Relocations`/GeoDataFrames,
+against the local stand-in server of `tests/mock_er_server.py`.
+
+Payloads are synthetic unless `--recording` points to a file saved with `MockERServer.save` (or `--save`).
+Run from the root of the repository, which needs to be on the path for `tests`:
+
+    PYTHONPATH=. python benchmarks/bench_earthranger_io.py --subjects 20 --events 20000 --latency 0.05
+
+With `--telemetry`, the time spent in each stage (requests, JSON decoding, parsing...) of the `EarthRangerIO` cases is
+printed after each of them.
+"""
+
+import argparse
+import asyncio
+import time
+
+import ecoscope
+from tests.mock_er_server import MockERServer
+
+
+def connect(server, args, **kwargs):
+    return dict(
+        server=server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        tcp_limit=args.tcp_limit,
+        sub_page_size=args.page_size,
+        **kwargs,
+    )
+
+
+def sync_cases(server, args, backend="threads", telemetry=None):
+    er_io = ecoscope.io.EarthRangerIO(backend=backend, **connect(server, args, telemetry=telemetry))
+    subject_ids = [s["id"] for s in server.subjects]
+    return {
+        f"sync/{backend} subject observations": lambda: er_io.get_subject_observations(subject_ids),
+        f"sync/{backend} events": lambda: er_io.get_events(),
+        f"sync/{backend} patrol observations": lambda: er_io.get_patrol_observations_with_patrol_filter(),
+    }
+
+
+def async_cases(server, args):
+    subject_ids = [s["id"] for s in server.subjects]
+
+    def run(method, **kwargs):
+        async def main():
+            er_io = await ecoscope.io.AsyncEarthRangerIO.create(**connect(server, args))
+            try:
+                return await getattr(er_io, method)(**kwargs)
+            finally:
+                await er_io.close()
+
+        return lambda: asyncio.run(main())
+
+    return {
+        "async subject observations": run("get_relocations", subject_ids=subject_ids),
+        "async events": run("get_events_dataframe"),
+        "async patrol observations": run("get_patrol_observations_with_patrol_filter"),
+    }
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--subjects", type=int, default=10)
+    argparser.add_argument("--observations", type=int, default=2000, help="observations per subject")
+    argparser.add_argument("--events", type=int, default=5000)
+    argparser.add_argument("--patrols", type=int, default=20)
+    argparser.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    argparser.add_argument("--page-size", type=int, default=1000, help="page size requested by the clients")
+    argparser.add_argument("--max-page-size", type=int, default=None, help="page size cap of the server")
+    argparser.add_argument("--tcp-limit", type=int, default=5)
+    argparser.add_argument("--recording", help="replay payloads from this file instead of generating them")
+    argparser.add_argument("--save", help="save the generated payloads to this file")
+    argparser.add_argument("--only", choices=["sync", "async"])
+    argparser.add_argument("--telemetry", action="store_true", help="print the time spent in each stage")
+    args = argparser.parse_args()
+
+    server_kwargs = dict(latency=args.latency, max_page_size=args.max_page_size)
+    if args.recording:
+        server = MockERServer.load(args.recording, **server_kwargs)
+    else:
+        server = MockERServer.synthetic(
+            subjects=args.subjects,
+            observations_per_subject=args.observations,
+            events=args.events,
+            patrols=args.patrols,
+            **server_kwargs,
+        )
+    if args.save:
+        server.save(args.save)
+
+    telemetry = ecoscope.io.Telemetry() if args.telemetry else None
+    with server:
+        cases = {}
+        if args.only != "async":
+            cases.update(sync_cases(server, args, telemetry=telemetry))
+            # `EarthRangerIO` downloading pages with the async transport
+            cases.update(sync_cases(server, args, backend="async", telemetry=telemetry))
+        if args.only != "sync":
+            cases.update(async_cases(server, args))
+
+        print(f"{'case':>34} {'seconds':>8} {'rows':>9} {'rows/s':>9} {'requests':>9}")
+        for name, case in cases.items():
+            server.requests.clear()
+            start = time.perf_counter()
+            result = case()
+            seconds = time.perf_counter() - start
+            print(f"{name:>34} {seconds:8.2f} {len(result):9d} {len(result) / seconds:9.0f} {len(server.requests):9d}")
+            if telemetry is not None and name.startswith("sync"):
+                print(telemetry.summary().to_string(float_format="{:.3f}".format), end="\n\n")
+                telemetry.reset()
+
+
+if __name__ == "__main__":
+    main()
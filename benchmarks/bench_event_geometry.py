@@ -0,0 +1,72 @@
+"""
+Benchmark building event geometries from synthetic EarthRanger-shaped `geojson` payloads.
+
+Compares `geojson_to_geometry` against the previous `GeoDataFrame.from_features` and per-event `shape` approaches.
+
+    python benchmarks/bench_event_geometry.py --events 1000000
+"""
+
+import argparse
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import shape
+
+from ecoscope.io.earthranger_utils import geojson_to_geometry
+
+
+def make_payload(events, polygon_fraction=0.01, missing_fraction=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(33.0, 42.0, events)
+    lat = rng.uniform(-5.0, 5.0, events)
+    kind = rng.choice(
+        ["Point", "Polygon", None],
+        events,
+        p=[1 - polygon_fraction - missing_fraction, polygon_fraction, missing_fraction],
+    )
+
+    features = []
+    for x, y, k in zip(lon, lat, kind):
+        if k is None:
+            features.append(None)
+            continue
+        if k == "Point":
+            geometry = {"type": "Point", "coordinates": [x, y]}
+        else:
+            ring = [[x, y], [x + 0.01, y], [x + 0.01, y + 0.01], [x, y + 0.01], [x, y]]
+            geometry = {"type": "Polygon", "coordinates": [ring]}
+        features.append({"type": "Feature", "geometry": geometry, "properties": {"datetime": "2023-01-01T00:00:00Z"}})
+    return pd.Series(features)
+
+
+def from_features(geojson):
+    geometry = gpd.GeoSeries([None] * len(geojson), index=geojson.index, crs=4326)
+    geometry[~geojson.isna()] = gpd.GeoDataFrame.from_features(geojson[~geojson.isna()])["geometry"].values
+    return geometry
+
+
+def shape_apply(geojson):
+    return gpd.GeoSeries(geojson.apply(lambda x: shape(x["geometry"]) if x else None), crs=4326)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument("--events", type=int, default=1_000_000)
+    args = argparser.parse_args()
+
+    payload = make_payload(args.events)
+
+    results = {}
+    for name, func in [("bulk", geojson_to_geometry), ("from_features", from_features), ("shape", shape_apply)]:
+        start = time.perf_counter()
+        results[name] = func(payload)
+        print(f"{name:>13}: {time.perf_counter() - start:.3f}s for {args.events} events")
+
+    for name in ["from_features", "shape"]:
+        assert results["bulk"].geom_equals(results[name]).sum() == results[name].notna().sum()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the time taken by `import ecoscope` and `import ecoscope.base`, as reported by `python -X importtime` in a
+fresh interpreter for each run, and list the imports taking the most time (leaving out those of the interpreter
+startup).
+
+    python benchmarks/bench_import_time.py --runs 5 --top 10
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+
+
+def import_times(statement):
+    """Cumulative import time in seconds of each module imported by `statement`, in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for match in LINE.finditer(result.stderr):
+        times[match.group(2)] = int(match.group(1)) / 1e6
+    return times
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--runs", type=int, default=5)
+    argparser.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+    argparser.add_argument(
+        "--statement",
+        action="append",
+        help="statements to time (defaults to `import ecoscope` and `import ecoscope.base`)",
+    )
+    args = argparser.parse_args()
+
+    startup = set(import_times("pass"))
+
+    for statement in args.statement or ["import ecoscope", "import ecoscope.base"]:
+        module = statement.split()[-1]
+        runs = [import_times(statement) for _ in range(args.runs)]
+        total = statistics.median(times.get(module, sum(times.values())) for times in runs)
+        imported = {name: seconds for name, seconds in runs[-1].items() if name not in startup}
+        print(f"{statement}: {total * 1000:.1f}ms (median of {args.runs} runs, {len(imported)} modules imported)")
+
+        slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[: args.top]
+        for name, seconds in slowest:
+            print(f"    {seconds * 1000:9.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
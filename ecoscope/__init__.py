@@ -1,4 +1,7 @@
-from ecoscope import base, io
+from ecoscope._lazy import attach
+
+# Subpackages, and their dependencies, are only imported once used
+__getattr__, __dir__ = attach(__name__, submodules=["analysis", "base", "contrib", "io", "mapping", "plotting"])
 
 ASCII = """\
  _____
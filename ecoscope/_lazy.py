@@ -0,0 +1,41 @@
+import importlib
+import sys
+
+
+def attach(package, submodules=(), attributes=None):
+    """
+    Lazily load the submodules of a package, and the attributes it re-exports from them, the first time they are
+    accessed (PEP 562), so that importing the package doesn't import their dependencies.
+
+    Parameters
+    ----------
+    package : str
+        Name of the package, i.e. `__name__` in its `__init__`
+    submodules : iterable[str]
+        Submodules accessible as attributes of the package
+    attributes : dict[str, str], optional
+        Submodule defining each re-exported attribute, by attribute name
+
+    Returns
+    -------
+    (__getattr__, __dir__) : tuple
+        Functions to assign to the `__getattr__` and `__dir__` of the package
+    """
+
+    submodules = set(submodules)
+    attributes = dict(attributes or {})
+
+    def __getattr__(name):
+        if name in submodules:
+            return importlib.import_module(f"{package}.{name}")
+        if name in attributes:
+            value = getattr(importlib.import_module(f"{package}.{attributes[name]}"), name)
+            # Later accesses find the attribute without going through `__getattr__`
+            setattr(sys.modules[package], name, value)
+            return value
+        raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | submodules | set(attributes))
+
+    return __getattr__, __dir__
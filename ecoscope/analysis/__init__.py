@@ -1,3 +1,24 @@
+from ecoscope._lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "UD",
+        "astronomy",
+        "classifier",
+        "ecograph",
+        "feature_density",
+        "geofence",
+        "geospatial",
+        "immobility",
+        "percentile",
+        "proximity",
+        "seasons",
+        "speed",
+    ],
+    attributes={"apply_classification": "classifier", "calculate_feature_density": "feature_density"},
+)
+
 __all__ = [
     "ecograph",
     "speed",
@@ -1,13 +1,19 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from math import ceil, floor
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
 import rasterio
-from shapely.geometry import shape
+import shapely
 from affine import Affine
 
 import ecoscope
+from ecoscope.base import step_dot_products, straightness_tortuosity, time_beeline_tortuosity
 
 try:
     import igraph
@@ -20,6 +26,16 @@ except ModuleNotFoundError:
          Please run pip install ecoscope["analysis"]'
     )
 
+STEP_ATTRIBUTES = [
+    "dot_product",
+    "speed",
+    "step_length",
+    "sin_time",
+    "cos_time",
+    "tortuosity_1",
+    "tortuosity_2",
+]
+
 
 class Ecograph:
     """
@@ -38,12 +54,51 @@ class Ecograph:
         too slow. Can be useful for very large graphs (Default : None)
     tortuosity_length : int
         The number of steps used to compute the two tortuosity metrics (Default : 3 steps)
+    betweenness_samples : int or None
+        Number of source nodes sampled to estimate betweenness instead of computing it over all pairs of nodes. Useful
+        for graphs with hundreds of thousands of nodes. Cannot be combined with `cutoff`. An estimate of the standard
+        error is stored in the `betweenness_stderr` feature (Default : None)
+    betweenness_chunks : int
+        Number of independent chunks the sampled sources are split into. The spread between the chunk estimates gives
+        the standard error, so at least 2 chunks are required to report it (Default : 4)
+    seed : int or None
+        Seed of the random generator used to sample the source nodes. Each subject is sampled with a generator seeded
+        from `seed` and its name, so that its result doesn't depend on the other subjects (Default : None)
+    n_jobs : int
+        Number of processes used to compute the sampled betweenness chunks in parallel (Default : 1)
+    cache : EcographCache or None
+        Cache of per-subject results. Subjects whose segments and parameters are unchanged since a previous run are
+        read from the cache instead of being recomputed. Sampled betweenness is only cached with a `seed`, as it isn't
+        reproducible otherwise (Default : None)
     """
 
-    def __init__(self, trajectory, resolution=15, radius=2, cutoff=None, tortuosity_length=3):
+    def __init__(
+        self,
+        trajectory,
+        resolution=15,
+        radius=2,
+        cutoff=None,
+        tortuosity_length=3,
+        betweenness_samples=None,
+        betweenness_chunks=4,
+        seed=None,
+        n_jobs=1,
+        cache=None,
+    ):
+        if betweenness_samples is not None and cutoff is not None:
+            raise ValueError("`cutoff` and `betweenness_samples` cannot be used at the same time")
+
         self.graphs = {}
+        self.steps = {}
         self.trajectory = trajectory
-        self.resolution = ceil(resolution)
+        self.radius = radius
+        self.cutoff = cutoff
+        self.tortuosity_length = tortuosity_length
+        self.betweenness_samples = betweenness_samples
+        self.betweenness_chunks = betweenness_chunks
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
 
         self.utm_crs = trajectory.estimate_utm_crs()
         self.trajectory.to_crs(self.utm_crs, inplace=True)
@@ -60,15 +115,119 @@ class Ecograph:
             "tortuosity_1",
             "tortuosity_2",
         ]
+        if betweenness_samples is not None:
+            self.features.append("betweenness_stderr")
         geom = self.trajectory["geometry"]
 
         eastings = np.array([geom.iloc[i].coords.xy[0] for i in range(len(geom))]).flatten()
         northings = np.array([geom.iloc[i].coords.xy[1] for i in range(len(geom))]).flatten()
+        self._bounds = (np.min(eastings), np.min(northings), np.max(eastings), np.max(northings))
+        self._set_grid(resolution)
+
+        if betweenness_samples is not None and seed is None:
+            cache = None
+
+        def compute(df):
+            subject_name = df.name
+            if seed is not None:
+                self._rng = np.random.default_rng([seed, int(hashlib.sha1(str(subject_name).encode()).hexdigest(), 16)])
+            if cache is not None:
+                key = cache.make_key(df, **self._get_cache_params())
+                cached = cache.get(key)
+                if cached is not None:
+                    print(f"Loading cached EcoGraph for subject {subject_name}")
+                    self.steps[subject_name], self.graphs[subject_name] = cached
+                    return
+
+            print(f"Computing EcoGraph for subject {subject_name}")
+            self.steps[subject_name] = self._get_steps(df, tortuosity_length)
+            G = self._get_ecograph(self.steps[subject_name], radius, cutoff)
+            self.graphs[subject_name] = G
+            if cache is not None:
+                cache.put(key, (self.steps[subject_name], G))
+
+        self.trajectory.groupby("groupby_col")[self.trajectory.columns].apply(compute)
+
+    @classmethod
+    def pyramid(cls, trajectory, resolutions, **kwargs):
+        """
+        Computes Ecographs at several resolutions while walking through the trajectory segments only once, at the
+        finest resolution. The coarser graphs are derived from the same steps with `to_resolution`.
+
+        Parameters
+        ----------
+        trajectory : ecoscope.base.Trajectory
+            Trajectory dataframe
+        resolutions : list of float
+            Pixel sizes, in meters
+        kwargs
+            Additional arguments passed to `Ecograph`
+
+        Returns
+        -------
+        ecographs : dict
+            Ecographs keyed by resolution, in the order of `resolutions`
+        """
+
+        finest = cls(trajectory, resolution=min(resolutions), **kwargs)
+        return {
+            resolution: finest if ceil(resolution) == finest.resolution else finest.to_resolution(resolution)
+            for resolution in resolutions
+        }
+
+    def to_resolution(self, resolution, radius=None, cutoff=None):
+        """
+        Derives an Ecograph at another (typically coarser) resolution from the steps already computed for this one.
+        The step attributes don't depend on the grid, so only the cell ids are recomputed before the nodes are
+        aggregated, the edges merged and the network metrics recomputed.
+
+        Parameters
+        ----------
+        resolution : float
+            Pixel size, in meters
+        radius : int
+            Radius to compute Collective Influence (Default : same as this Ecograph)
+        cutoff : int
+            Cutoff to compute an approximation of betweenness index (Default : same as this Ecograph)
+
+        Returns
+        -------
+        ecograph : Ecograph
+        """
 
-        self.xmin = floor(np.min(eastings)) - self.resolution
-        self.ymin = floor(np.min(northings)) - self.resolution
-        self.xmax = ceil(np.max(eastings)) + self.resolution
-        self.ymax = ceil(np.max(northings)) + self.resolution
+        ecograph = object.__new__(type(self))
+        ecograph.__dict__.update(self.__dict__)
+        ecograph.radius = self.radius if radius is None else radius
+        ecograph.cutoff = self.cutoff if cutoff is None else cutoff
+        ecograph.features = list(self.features)
+        ecograph._set_grid(resolution)
+        ecograph.graphs = {
+            subject_name: ecograph._get_ecograph(steps, ecograph.radius, ecograph.cutoff)
+            for subject_name, steps in self.steps.items()
+        }
+        return ecograph
+
+    def _get_cache_params(self):
+        return {
+            "resolution": self.resolution,
+            "radius": self.radius,
+            "cutoff": self.cutoff,
+            "tortuosity_length": self.tortuosity_length,
+            "betweenness_samples": self.betweenness_samples,
+            "betweenness_chunks": self.betweenness_chunks,
+            "seed": self.seed,
+            "crs": self.utm_crs.to_wkt(),
+            "transform": tuple(self.transform),
+        }
+
+    def _set_grid(self, resolution):
+        self.resolution = ceil(resolution)
+        x_min, y_min, x_max, y_max = self._bounds
+
+        self.xmin = floor(x_min) - self.resolution
+        self.ymin = floor(y_min) - self.resolution
+        self.xmax = ceil(x_max) + self.resolution
+        self.ymax = ceil(y_max) + self.resolution
 
         self.xmax += self.resolution - ((self.xmax - self.xmin) % self.resolution)
         self.ymax += self.resolution - ((self.ymax - self.ymin) % self.resolution)
@@ -79,14 +238,6 @@ class Ecograph:
         self.n_rows = int((self.xmax - self.xmin) // self.resolution)
         self.n_cols = int((self.ymax - self.ymin) // self.resolution)
 
-        def compute(df):
-            subject_name = df.name
-            print(f"Computing EcoGraph for subject {subject_name}")
-            G = self._get_ecograph(df, subject_name, radius, cutoff, tortuosity_length)
-            self.graphs[subject_name] = G
-
-        self.trajectory.groupby("groupby_col")[self.trajectory.columns].apply(compute)
-
     def to_csv(self, output_path):
         """
         Saves the features of all nodes in a CSV file
@@ -158,40 +309,58 @@ class Ecograph:
             **raster_profile,
         )
 
-    def _get_ecograph(self, trajectory_gdf, individual_name, radius, cutoff, tortuosity_length):
-        G = nx.Graph()
-        geom = trajectory_gdf["geometry"]
-        for i in range(len(geom) - (tortuosity_length - 1)):
-            step_attributes = trajectory_gdf.iloc[i]
-            lines = [list(geom.iloc[i + j].coords) for j in range(tortuosity_length)]
-            p1, p2, p3, p4 = lines[0][0], lines[0][1], lines[1][1], lines[1][0]
-            pixel1, pixel2 = (
-                self.inverse_transform * p1,
-                self.inverse_transform * p2,
-            )
-
-            row1, row2 = floor(pixel1[0]), floor(pixel2[0])
-            col1, col2 = ceil(pixel1[1]), ceil(pixel2[1])
-
-            t = step_attributes["segment_start"]
-            seconds_in_day = 24 * 60 * 60
-            seconds_past_midnight = (t.hour * 3600) + (t.minute * 60) + t.second + (t.microsecond / 1000000.0)
-            time_diff = pd.to_datetime(
-                trajectory_gdf.iloc[i + (tortuosity_length - 1)]["segment_end"]
-            ) - pd.to_datetime(t)
-            time_delta = time_diff.total_seconds() / 3600.0
-            tortuosity_1, tortuosity_2 = self._get_tortuosities(lines, time_delta)
-
-            attributes = {
-                "dot_product": self._get_dot_product(p1, p2, p3, p4),
-                "speed": step_attributes["speed_kmhr"],
-                "step_length": step_attributes["dist_meters"],
+    @staticmethod
+    def _get_steps(trajectory_gdf, tortuosity_length):
+        n = len(trajectory_gdf) - (tortuosity_length - 1)
+        coords = shapely.get_coordinates(trajectory_gdf.geometry.values).reshape(-1, 2, 2)
+        x0, y0, x1, y1 = coords[:, 0, 0], coords[:, 0, 1], coords[:, 1, 0], coords[:, 1, 1]
+
+        segment_start = pd.DatetimeIndex(trajectory_gdf["segment_start"])
+        segment_end = pd.DatetimeIndex(trajectory_gdf["segment_end"])
+        timespan_hours = np.full(len(trajectory_gdf), np.nan)
+        timespan_hours[: max(n, 0)] = (
+            segment_end[tortuosity_length - 1 :] - segment_start[: max(n, 0)]
+        ).total_seconds()
+        timespan_hours /= 3600.0
+
+        seconds_in_day = 24 * 60 * 60
+        seconds_past_midnight = (
+            (segment_start.hour * 3600)
+            + (segment_start.minute * 60)
+            + segment_start.second
+            + (segment_start.microsecond / 1000000.0)
+        ).to_numpy()
+
+        steps = pd.DataFrame(
+            {
+                "x1": x0,
+                "y1": y0,
+                "x2": x1,
+                "y2": y1,
+                "dot_product": step_dot_products(x0, y0, x1, y1),
+                "speed": trajectory_gdf["speed_kmhr"].to_numpy(),
+                "step_length": trajectory_gdf["dist_meters"].to_numpy(),
                 "sin_time": np.sin(2 * np.pi * seconds_past_midnight / seconds_in_day),
                 "cos_time": np.cos(2 * np.pi * seconds_past_midnight / seconds_in_day),
-                "tortuosity_1": tortuosity_1,
-                "tortuosity_2": tortuosity_2,
+                "tortuosity_1": straightness_tortuosity(x0, y0, x1, y1, window=tortuosity_length),
+                "tortuosity_2": time_beeline_tortuosity(x0, y0, x1, y1, timespan_hours, window=tortuosity_length),
             }
+        )
+        return steps.iloc[: max(n, 0)].reset_index(drop=True)
+
+    def _get_ecograph(self, steps, radius, cutoff):
+        G = nx.Graph()
 
+        # Cell ids of the start and end of every step on the current grid
+        pixel1 = self.inverse_transform * (steps["x1"].to_numpy(), steps["y1"].to_numpy())
+        pixel2 = self.inverse_transform * (steps["x2"].to_numpy(), steps["y2"].to_numpy())
+        rows1, rows2 = np.floor(pixel1[0]).astype(int), np.floor(pixel2[0]).astype(int)
+        cols1, cols2 = np.ceil(pixel1[1]).astype(int), np.ceil(pixel2[1]).astype(int)
+
+        step_attributes = steps[STEP_ATTRIBUTES].to_dict("records")
+        for row1, col1, row2, col2, attributes in zip(
+            rows1.tolist(), cols1.tolist(), rows2.tolist(), cols2.tolist(), step_attributes
+        ):
             if G.has_node((row1, col1)):
                 self._update_node(G, (row1, col1), attributes)
             else:
@@ -202,7 +371,7 @@ class Ecograph:
                 G.add_edge((row1, col1), (row2, col2))
 
         for node in G.nodes():
-            for key in attributes.keys():
+            for key in STEP_ATTRIBUTES:
                 if len(G.nodes[node][key]) != 0:
                     G.nodes[node][key] = np.nanmean(G.nodes[node][key])
                 else:
@@ -235,46 +404,6 @@ class Ecograph:
             else:
                 G.nodes[node_id][key] = [value]
 
-    @staticmethod
-    def _get_dot_product(x, y, z, w):
-        if (floor(y[0]) == floor(w[0])) and (floor(y[1]) == floor(w[1])):
-            v = [y[0] - x[0], y[1] - x[1]]
-            w = [z[0] - y[0], z[1] - y[1]]
-            angle = np.arctan2(w[1], w[0]) - np.arctan2(v[1], v[0])
-
-            while angle <= -np.pi:
-                angle = angle + 2 * np.pi
-            while angle > np.pi:
-                angle = angle - 2 * np.pi
-            return np.cos(angle)
-        else:
-            return np.nan
-
-    def _get_tortuosities(self, lines, time_delta):
-        point1, point2 = lines[0][0], lines[len(lines) - 1][1]
-        beeline_dist = np.sqrt((point2[0] - point1[0]) ** 2 + (point2[1] - point1[1]) ** 2)
-        total_length = 0
-        for i in range(len(lines) - 1):
-            point1, point2, point3 = lines[i][0], lines[i][1], lines[i + 1][0]
-            if (floor(point2[0]) == floor(point3[0])) and (floor(point2[1]) == floor(point3[1])):
-                total_length += ((point2[0] - point1[0]) ** 2 + (point2[1] - point1[1]) ** 2) ** 0.5
-            else:
-                if beeline_dist != 0:
-                    return np.nan, np.log(time_delta / (beeline_dist**2))
-                else:
-                    return np.nan, np.nan
-        point1, point2 = lines[len(lines) - 1][0], lines[len(lines) - 1][1]
-        total_length += ((point2[0] - point1[0]) ** 2 + (point2[1] - point1[1]) ** 2) ** 0.5
-
-        if (total_length != 0) and (beeline_dist != 0):
-            return (beeline_dist / total_length), np.log(time_delta / (beeline_dist**2))
-        elif (total_length == 0) and (beeline_dist > 0):
-            return np.nan, np.log(time_delta / (beeline_dist**2))
-        elif (total_length > 0) and (beeline_dist == 0):
-            return 0, np.nan
-        else:
-            return np.nan, np.nan
-
     def _compute_network_metrics(self, G, radius, cutoff):
         self._compute_degree(G)
         self._compute_betweenness(G, cutoff)
@@ -298,13 +427,49 @@ class Ecograph:
         collective_influence -= G.degree[start]
         return (G.degree[start]) * collective_influence
 
-    @staticmethod
-    def _compute_betweenness(G, cutoff):
+    def _compute_betweenness(self, G, cutoff):
         g = igraph.Graph.from_networkx(G)
-        btw_idx = g.betweenness(cutoff=cutoff)
+        if self.betweenness_samples is None:
+            btw_idx = g.betweenness(cutoff=cutoff)
+            btw_err = None
+        else:
+            btw_idx, btw_err = self._get_sampled_betweenness(g)
+
         for v in g.vs:
             node = v["_nx_name"]
             G.nodes[node]["betweenness"] = btw_idx[v.index]
+            if btw_err is not None:
+                G.nodes[node]["betweenness_stderr"] = btw_err[v.index]
+
+    def _get_sampled_betweenness(self, g):
+        """
+        Estimate betweenness from shortest paths starting at a random sample of source nodes. The sampled sources are
+        split into chunks that are computed independently (and in parallel if `n_jobs` > 1): each chunk yields an
+        unbiased estimate, their mean is the returned betweenness and their spread its standard error.
+        """
+        n = g.vcount()
+        if self.betweenness_samples >= n:
+            return np.array(g.betweenness()), np.zeros(n)
+
+        sources = self._rng.choice(n, size=self.betweenness_samples, replace=False)
+        chunks = [c.tolist() for c in np.array_split(sources, min(self.betweenness_chunks, len(sources)))]
+
+        if self.n_jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                partials = list(executor.map(_get_partial_betweenness, [g] * len(chunks), chunks))
+        else:
+            partials = [_get_partial_betweenness(g, chunk) for chunk in chunks]
+
+        partials = np.array(partials)
+        sizes = np.array([len(chunk) for chunk in chunks])
+        estimates = partials * (n / sizes)[:, None]
+
+        btw_idx = partials.sum(axis=0) * n / len(sources)
+        if len(chunks) > 1:
+            btw_err = estimates.std(axis=0, ddof=1) / np.sqrt(len(chunks))
+        else:
+            btw_err = np.full(n, np.nan)
+        return btw_idx, btw_err
 
     def _get_feature_mosaic(self, feature, interpolation=None):
         features = []
@@ -369,7 +534,129 @@ class Ecograph:
         return feature_ndarray
 
 
-def get_feature_gdf(input_path):
+class EcographCache:
+    """
+    A size-bounded LRU cache of per-subject Ecograph results, kept in memory and optionally persisted on disk.
+
+    Entries are keyed on a stable hash of the subject's segment arrays and of the Ecograph parameters, so unchanged
+    trajectories computed with the same parameters are not recomputed.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries kept in memory (Default : 128)
+    cache_dir : str, Pathlike or None
+        Directory where entries are pickled. If None, the cache lives in memory only (Default : None)
+    max_disk_bytes : int or None
+        Maximum total size of the pickled entries. The least recently used files are removed once it is exceeded
+        (Default : None)
+    """
+
+    def __init__(self, maxsize=128, cache_dir=None, max_disk_bytes=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(trajectory_gdf, **params):
+        """
+        Hashes the segments of a single subject along with the parameters used to compute its Ecograph.
+
+        Parameters
+        ----------
+        trajectory_gdf : geopandas.GeoDataFrame
+            Trajectory segments of one subject
+        params
+            Parameters that influence the result
+
+        Returns
+        -------
+        key : str
+        """
+
+        h = hashlib.sha256()
+        h.update(np.ascontiguousarray(shapely.get_coordinates(trajectory_gdf.geometry.values)).tobytes())
+        for col in ["segment_start", "segment_end"]:
+            h.update(np.ascontiguousarray(trajectory_gdf[col].values.astype("datetime64[ns]").view("int64")).tobytes())
+        for col in ["speed_kmhr", "dist_meters"]:
+            h.update(np.ascontiguousarray(trajectory_gdf[col].to_numpy(dtype=np.float64)).tobytes())
+        h.update(repr(sorted(params.items())).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(self._entries[key])
+
+        path = self._get_path(key)
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+            self._store(key, value)
+            self.hits += 1
+            return self._copy(value)
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._store(key, self._copy(value))
+
+        path = self._get_path(key)
+        if path is not None:
+            with open(path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._evict_from_disk()
+
+    def clear(self):
+        self._entries.clear()
+        if self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _get_path(self, key):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _evict_from_disk(self):
+        if self.max_disk_bytes is None:
+            return
+
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".pkl")]
+        files.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.max_disk_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+    @staticmethod
+    def _copy(value):
+        steps, G = value
+        return steps.copy(), G.copy()
+
+
+def _get_partial_betweenness(g, sources):
+    return g.betweenness(sources=sources)
+
+
+def get_feature_gdf(input_path, as_cells=False):
     """
     Convert a GeoTIFF feature map into a GeoDataFrame
 
@@ -377,19 +664,21 @@ def get_feature_gdf(input_path):
     ----------
     input_path : str, Pathlike
         Input path for the GeoTIFF file
+    as_cells : bool
+        If True, emit one polygon per grid cell instead of merging neighbouring cells with the same value
+        (Default : False)
     """
-    shapes = []
     with rasterio.open(input_path) as src:
         crs = src.crs.to_wkt()
         data_array = src.read(1).astype(np.float32)
         data_array[data_array == src.nodata] = np.nan
-        shapes.extend(rasterio.features.shapes(data_array, transform=src.transform))
-
-    data = {"value": [], "geometry": []}
-    for geom, value in shapes:
-        if not np.isnan(value):
-            data["geometry"].append(shape(geom))
-            data["value"].append(value)
+        if as_cells:
+            geometries, values = ecoscope.io.raster.cells_to_geometries(data_array, src.transform)
+        else:
+            geometries, values = ecoscope.io.raster.shapes_to_geometries(
+                rasterio.features.shapes(data_array, transform=src.transform)
+            )
 
-    df = pd.DataFrame.from_dict(data)
+    keep = ~np.isnan(values)
+    df = pd.DataFrame({"value": values[keep].astype(np.float64), "geometry": geometries[keep]})
     return gpd.GeoDataFrame(df, geometry=df.geometry, crs=crs)
@@ -1,16 +1,25 @@
-from ecoscope.base._dataclasses import (
-    RelocsCoordinateFilter,
-    RelocsDateRangeFilter,
-    RelocsDistFilter,
-    RelocsSpeedFilter,
-    TrajSegFilter,
-)
-from ecoscope.base.base import EcoDataFrame, Relocations, Trajectory
-from ecoscope.base.utils import (
-    create_meshgrid,
-    groupby_intervals,
-    hex_to_rgba,
-    color_tuple_to_css,
+from ecoscope._lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=["base", "utils"],
+    attributes={
+        "RelocsCoordinateFilter": "_dataclasses",
+        "RelocsDateRangeFilter": "_dataclasses",
+        "RelocsDistFilter": "_dataclasses",
+        "RelocsSpeedFilter": "_dataclasses",
+        "TrajSegFilter": "_dataclasses",
+        "step_dot_products": "_kernels",
+        "straightness_tortuosity": "_kernels",
+        "time_beeline_tortuosity": "_kernels",
+        "EcoDataFrame": "base",
+        "Relocations": "base",
+        "Trajectory": "base",
+        "create_meshgrid": "utils",
+        "groupby_intervals": "utils",
+        "hex_to_rgba": "utils",
+        "color_tuple_to_css": "utils",
+    },
 )
 
 __all__ = [
@@ -26,4 +35,7 @@ __all__ = [
     "groupby_intervals",
     "hex_to_rgba",
     "color_tuple_to_css",
+    "step_dot_products",
+    "straightness_tortuosity",
+    "time_beeline_tortuosity",
 ]
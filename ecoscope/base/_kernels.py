@@ -0,0 +1,228 @@
+"""
+Vectorized kernels computing step-wise movement metrics for whole trajectories at once.
+
+All kernels take the start and end coordinates of consecutive segments of a single subject (in a projected CRS) and
+return one value per segment. Two segments are considered contiguous when the end of the first and the start of the
+second fall within the same unit cell (i.e. their floored coordinates match). Each kernel accepts an `engine`
+argument: "numpy" (default) or "numba", which requires the optional numba dependency.
+"""
+
+import numpy as np
+
+
+def _check_engine(engine):
+    if engine == "numpy":
+        return None
+    elif engine == "numba":
+        try:
+            import numba
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                'Missing optional dependencies required by this engine. \
+                 Please run pip install ecoscope["analysis"]'
+            )
+        return numba
+    raise ValueError("engine must be 'numpy' or 'numba'")
+
+
+def _as_arrays(*arrays):
+    return tuple(np.ascontiguousarray(a, dtype=np.float64) for a in arrays)
+
+
+def _contiguous(x1, y1, x0, y0):
+    # Whether segment i ends in the same unit cell where segment i + 1 starts
+    return (np.floor(x1[:-1]) == np.floor(x0[1:])) & (np.floor(y1[:-1]) == np.floor(y0[1:]))
+
+
+def _windowed_all(values, window):
+    # out[i] = all(values[i : i + window])
+    n = len(values) - window + 1
+    out = np.ones(max(n, 0), dtype=bool)
+    for j in range(window):
+        out &= values[j : j + n]
+    return out
+
+
+def _windowed_sum(values, window):
+    # out[i] = values[i] + ... + values[i + window - 1], accumulated from left to right
+    n = len(values) - window + 1
+    out = np.zeros(max(n, 0), dtype=np.float64)
+    for j in range(window):
+        out += values[j : j + n]
+    return out
+
+
+def step_dot_products(x0, y0, x1, y1, engine="numpy"):
+    """
+    Cosine of the turning angle between each segment and the next one.
+
+    Parameters
+    ----------
+    x0, y0, x1, y1 : array-like
+        Start and end coordinates of consecutive segments
+    engine : str
+        "numpy" or "numba"
+
+    Returns
+    -------
+    dot_products : np.ndarray
+        One value per segment. NaN where the next segment isn't contiguous, and for the last segment.
+    """
+
+    x0, y0, x1, y1 = _as_arrays(x0, y0, x1, y1)
+    if _check_engine(engine) is not None:
+        return _get_numba_kernels()[0](x0, y0, x1, y1)
+
+    out = np.full(len(x0), np.nan)
+    if len(x0) < 2:
+        return out
+
+    angle = np.arctan2(y1[1:] - y1[:-1], x1[1:] - x1[:-1]) - np.arctan2(y1[:-1] - y0[:-1], x1[:-1] - x0[:-1])
+    angle = np.where(angle <= -np.pi, angle + 2 * np.pi, angle)
+    angle = np.where(angle > np.pi, angle - 2 * np.pi, angle)
+    out[:-1] = np.where(_contiguous(x1, y1, x0, y0), np.cos(angle), np.nan)
+    return out
+
+
+def straightness_tortuosity(x0, y0, x1, y1, window=3, engine="numpy"):
+    """
+    Straightness of each window of `window` segments: the beeline distance between the start of its first segment and
+    the end of its last one, divided by the length travelled along the segments.
+
+    Parameters
+    ----------
+    x0, y0, x1, y1 : array-like
+        Start and end coordinates of consecutive segments
+    window : int
+        Number of segments per window
+    engine : str
+        "numpy" or "numba"
+
+    Returns
+    -------
+    straightness : np.ndarray
+        One value per segment, for the window starting at that segment. NaN if the window contains non-contiguous
+        segments, runs past the end of the trajectory or has no length, and 0 for a window returning to its start.
+    """
+
+    x0, y0, x1, y1 = _as_arrays(x0, y0, x1, y1)
+    if _check_engine(engine) is not None:
+        return _get_numba_kernels()[1](x0, y0, x1, y1, window)
+
+    out = np.full(len(x0), np.nan)
+    n = len(x0) - window + 1
+    if n <= 0:
+        return out
+
+    beeline = np.sqrt((x1[window - 1 :] - x0[:n]) ** 2 + (y1[window - 1 :] - y0[:n]) ** 2)
+    total_length = _windowed_sum(((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5, window)
+    contiguous = _windowed_all(_contiguous(x1, y1, x0, y0), window - 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        straightness = np.where((total_length != 0) & (beeline != 0), beeline / total_length, np.nan)
+    straightness = np.where((total_length > 0) & (beeline == 0), 0.0, straightness)
+    out[:n] = np.where(contiguous, straightness, np.nan)
+    return out
+
+
+def time_beeline_tortuosity(x0, y0, x1, y1, timespan_hours, window=3, engine="numpy"):
+    """
+    Log of the time spent in each window of `window` segments divided by the squared beeline distance between the
+    start of its first segment and the end of its last one.
+
+    Parameters
+    ----------
+    x0, y0, x1, y1 : array-like
+        Start and end coordinates of consecutive segments
+    timespan_hours : array-like
+        Duration of each window, in hours, indexed by its first segment
+    window : int
+        Number of segments per window
+    engine : str
+        "numpy" or "numba"
+
+    Returns
+    -------
+    tortuosity : np.ndarray
+        One value per segment, for the window starting at that segment. NaN if the window runs past the end of the
+        trajectory or returns to its start.
+    """
+
+    x0, y0, x1, y1, timespan_hours = _as_arrays(x0, y0, x1, y1, timespan_hours)
+    if _check_engine(engine) is not None:
+        return _get_numba_kernels()[2](x0, y0, x1, y1, timespan_hours, window)
+
+    out = np.full(len(x0), np.nan)
+    n = len(x0) - window + 1
+    if n <= 0:
+        return out
+
+    beeline = np.sqrt((x1[window - 1 :] - x0[:n]) ** 2 + (y1[window - 1 :] - y0[:n]) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:n] = np.where(beeline != 0, np.log(timespan_hours[:n] / (beeline**2)), np.nan)
+    return out
+
+
+_numba_kernels = None
+
+
+def _get_numba_kernels():
+    global _numba_kernels
+    if _numba_kernels is not None:
+        return _numba_kernels
+
+    import numba
+
+    @numba.njit(cache=True)
+    def _contiguous_at(x0, y0, x1, y1, i):
+        return np.floor(x1[i]) == np.floor(x0[i + 1]) and np.floor(y1[i]) == np.floor(y0[i + 1])
+
+    @numba.njit(cache=True)
+    def _step_dot_products(x0, y0, x1, y1):
+        out = np.full(len(x0), np.nan)
+        for i in range(len(x0) - 1):
+            if _contiguous_at(x0, y0, x1, y1, i):
+                angle = np.arctan2(y1[i + 1] - y1[i], x1[i + 1] - x1[i]) - np.arctan2(y1[i] - y0[i], x1[i] - x0[i])
+                if angle <= -np.pi:
+                    angle += 2 * np.pi
+                elif angle > np.pi:
+                    angle -= 2 * np.pi
+                out[i] = np.cos(angle)
+        return out
+
+    @numba.njit(cache=True)
+    def _straightness_tortuosity(x0, y0, x1, y1, window):
+        out = np.full(len(x0), np.nan)
+        for i in range(len(x0) - window + 1):
+            contiguous = True
+            for j in range(i, i + window - 1):
+                if not _contiguous_at(x0, y0, x1, y1, j):
+                    contiguous = False
+                    break
+            if not contiguous:
+                continue
+
+            total_length = 0.0
+            for j in range(i, i + window):
+                total_length += ((x1[j] - x0[j]) ** 2 + (y1[j] - y0[j]) ** 2) ** 0.5
+            last = i + window - 1
+            beeline = np.sqrt((x1[last] - x0[i]) ** 2 + (y1[last] - y0[i]) ** 2)
+
+            if total_length != 0 and beeline != 0:
+                out[i] = beeline / total_length
+            elif total_length > 0 and beeline == 0:
+                out[i] = 0.0
+        return out
+
+    @numba.njit(cache=True)
+    def _time_beeline_tortuosity(x0, y0, x1, y1, timespan_hours, window):
+        out = np.full(len(x0), np.nan)
+        for i in range(len(x0) - window + 1):
+            last = i + window - 1
+            beeline = np.sqrt((x1[last] - x0[i]) ** 2 + (y1[last] - y0[i]) ** 2)
+            if beeline != 0:
+                out[i] = np.log(timespan_hours[i] / (beeline**2))
+        return out
+
+    _numba_kernels = (_step_dot_products, _straightness_tortuosity, _time_beeline_tortuosity)
+    return _numba_kernels
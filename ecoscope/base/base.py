@@ -14,6 +14,7 @@ from ecoscope.base._dataclasses import (
     RelocsSpeedFilter,
     TrajSegFilter,
 )
+from ecoscope.base._kernels import straightness_tortuosity
 
 
 class EcoDataFrame(gpd.GeoDataFrame):
@@ -373,13 +374,45 @@ class Trajectory(EcoDataFrame):
         end = self.geometry.iloc[-1].coords[1]
         return Geod(ellps="WGS84").inv(start[0], start[1], end[0], end[1])[2]
 
-    def get_tortuosity(self):
+    def get_tortuosity(self, window=None):
         """
         Get tortuosity for dataframe defined as distance traveled divided by displacement between first and final
         points.
+
+        Parameters
+        ----------
+        window : int, optional
+            If provided, compute the tortuosity of every window of `window` consecutive segments of each subject
+            instead of the whole dataframe. Windows spanning non-contiguous segments are NaN.
+
+        Returns
+        -------
+        float or pd.Series
+            A single value, or one value per segment (for the window starting at that segment) if `window` is set
         """
 
-        return self["dist_meters"].sum() / self.get_displacement()
+        if window is None:
+            return self["dist_meters"].sum() / self.get_displacement()
+
+        # Values are returned in the order of the segments of the trajectory as given
+        index = self.index
+        if not self["segment_start"].is_monotonic_increasing:
+            self = self.sort_values("segment_start")
+
+        def tortuosity(traj):
+            coords = shapely.get_coordinates(traj.geometry.values).reshape(-1, 2, 2)
+            straightness = straightness_tortuosity(
+                coords[:, 0, 0], coords[:, 0, 1], coords[:, 1, 0], coords[:, 1, 1], window=window
+            )
+            with np.errstate(divide="ignore"):
+                return pd.Series(1 / straightness, index=traj.index)
+
+        projected = self.to_crs(self.estimate_utm_crs())
+        return (
+            pd.concat([tortuosity(traj) for _, traj in projected.groupby("groupby_col")])
+            .rename("tortuosity")
+            .reindex(index)
+        )
 
     @staticmethod
     def _create_multitraj(df):
@@ -1,20 +1,41 @@
-from ecoscope.io import earthranger, eetools, raster, utils
-from ecoscope.io.earthranger import EarthRangerIO
-from ecoscope.io.utils import download_file
+from ecoscope._lazy import attach
 
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=[
+        "async_earthranger",
+        "checkpoint",
+        "earthranger",
+        "earthranger_utils",
+        "eetools",
+        "observation_store",
+        "raster",
+        "telemetry",
+        "utils",
+    ],
+    attributes={
+        "AsyncEarthRangerIO": "async_earthranger",
+        "DownloadCheckpoint": "checkpoint",
+        "EarthRangerIO": "earthranger",
+        "ObservationStore": "observation_store",
+        "Telemetry": "telemetry",
+        "download_file": "utils",
+    },
+)
+
+# `AsyncEarthRangerIO` is left out as it needs the optional dependencies of `ecoscope[async_earthranger]`
 __all__ = [
+    "checkpoint",
+    "DownloadCheckpoint",
     "earthranger",
     "EarthRangerIO",
     "download_file",
     "earthranger_utils",
     "eetools",
+    "observation_store",
+    "ObservationStore",
     "raster",
+    "telemetry",
+    "Telemetry",
     "utils",
 ]
-
-try:
-    from ecoscope.io.async_earthranger import AsyncEarthRangerIO
-
-    __all__ += ["AsyncEarthRangerIO"]
-except ImportError:
-    pass
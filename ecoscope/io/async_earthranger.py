@@ -1,10 +1,25 @@
+import functools
 import json
+import time
+from collections import deque
+
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import asyncio
 
 import ecoscope
-from ecoscope.io.earthranger_utils import clean_kwargs, to_gdf, clean_time_cols, to_hex
+from ecoscope.io.earthranger_utils import (
+    clean_kwargs,
+    to_gdf,
+    clean_time_cols,
+    to_hex,
+    concat_observation_columns,
+    MetadataCache,
+    geojson_to_geometry,
+    observations_to_columns,
+)
+from ecoscope.io.telemetry import measure, measure_decode, record_async_response
 from erclient.client import ERClientException, ERClientNotFound
 
 try:
@@ -17,7 +32,15 @@ except ModuleNotFoundError:
 
 
 class AsyncEarthRangerIO(AsyncERClient):
-    def __init__(self, sub_page_size=4000, tcp_limit=5, **kwargs):
+    def __init__(
+        self,
+        sub_page_size=4000,
+        tcp_limit=5,
+        metadata_cache_ttl=None,
+        metadata_cache_maxsize=256,
+        telemetry=None,
+        **kwargs,
+    ):
         if "server" in kwargs:
             server = kwargs.pop("server")
             kwargs["service_root"] = f"{server}/api/v1.0"
@@ -26,10 +49,22 @@ class AsyncEarthRangerIO(AsyncERClient):
         self.sub_page_size = sub_page_size
         self.tcp_limit = tcp_limit
         self.event_type_display_values = None
+        self.request_latencies = deque(maxlen=100_000)
+        # See `EarthRangerIO`
+        self.metadata_cache = MetadataCache(metadata_cache_maxsize, metadata_cache_ttl) if metadata_cache_ttl else None
 
         kwargs["client_id"] = kwargs.get("client_id", "das_web_client")
         super().__init__(**kwargs)
 
+        # See `EarthRangerIO`
+        self.telemetry = telemetry
+        if telemetry is not None:
+            hooks = self._http_session.event_hooks
+            self._http_session.event_hooks = {
+                **hooks,
+                "response": [*hooks["response"], functools.partial(record_async_response, telemetry)],
+            }
+
     @classmethod
     async def create(cls, **kwargs):
         client = cls(**kwargs)
@@ -52,6 +87,50 @@ class AsyncEarthRangerIO(AsyncERClient):
     async def get_me(self):
         return await self._get("user/me", params={})
 
+    async def _get(self, path, base_url=None, params=None):
+        cache = self.metadata_cache
+        key = None
+        if cache is not None and cache.is_cacheable(path):
+            key = cache.make_key(path, base_url=base_url, params=params)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+        start = time.perf_counter()
+        try:
+            with measure_decode(self.telemetry):
+                response = await super()._get(path, base_url=base_url, params=params)
+        finally:
+            self.request_latencies.append(time.perf_counter() - start)
+
+        if key is not None:
+            cache.put(key, response)
+        return response
+
+    async def _call(self, path, payload, method, *args, **kwargs):
+        if method != "GET" and self.metadata_cache is not None:
+            self.metadata_cache.invalidate()
+        return await super()._call(path, payload, method, *args, **kwargs)
+
+    def get_request_latency_stats(self):
+        """
+        Summarize the latency of the GET requests made by this client (the most recent 100,000 are kept).
+        Returns
+        -------
+        stats : dict
+            Number of requests, and mean, median, 95th percentile and max latency in seconds
+        """
+        latencies = np.array(self.request_latencies)
+        if not len(latencies):
+            return {"count": 0, "mean": np.nan, "p50": np.nan, "p95": np.nan, "max": np.nan}
+        return {
+            "count": len(latencies),
+            "mean": latencies.mean(),
+            "p50": np.percentile(latencies, 50),
+            "p95": np.percentile(latencies, 95),
+            "max": latencies.max(),
+        }
+
     async def get_sources(
         self,
         manufacturer_id=None,
@@ -375,17 +454,157 @@ class AsyncEarthRangerIO(AsyncERClient):
         async for observation in self.get_observations(**kwargs):
             observations.append(observation)
 
-        observations = pd.DataFrame(observation)
+        observations = pd.DataFrame(observations)
 
         if observations.empty:
             return gpd.GeoDataFrame()
         observations = clean_time_cols(observations)
-        observations["created_at"] = observations["created_at"].dt.tz_convert(kwargs.get("tz"))
-        observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(kwargs.get("tz"))
+        observations["created_at"] = observations["created_at"].dt.tz_convert(kwargs.get("tz", "UTC"))
+        observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(kwargs.get("tz", "UTC"))
 
         observations.sort_values("recorded_at", inplace=True)
         return to_gdf(observations)
 
+    async def _iter_observation_columns(
+        self,
+        source_ids=None,
+        subject_ids=None,
+        subjectsource_ids=None,
+        since=None,
+        until=None,
+        filter=None,
+        include_details=None,
+        created_after=None,
+        **addl_kwargs,
+    ):
+        assert (source_ids, subject_ids, subjectsource_ids).count(None) == 2
+
+        page_size = addl_kwargs.pop("page_size", self.sub_page_size)
+        params = clean_kwargs(
+            addl_kwargs,
+            since=since,
+            until=until,
+            filter=filter,
+            include_details=include_details,
+            created_after=created_after,
+            page_size=page_size,
+        )
+
+        if source_ids:
+            id_name, ids = "source_id", source_ids
+        elif subject_ids:
+            id_name, ids = "subject_id", subject_ids
+        else:
+            id_name, ids = "subjectsource_id", subjectsource_ids
+        ids = list(dict.fromkeys([ids] if isinstance(ids, str) else ids))
+
+        # Pages wait in a bounded queue so that producers can't run ahead of a slow consumer
+        semaphore = asyncio.Semaphore(self.tcp_limit)
+        queue = asyncio.Queue(maxsize=self.tcp_limit)
+
+        async def fetch(_id):
+            async with semaphore:
+                page = []
+                async for observation in self._get_data("observations/", params={**params, id_name: _id}):
+                    page.append(observation)
+                    if len(page) == page_size:
+                        await queue.put(self._observations_to_columns(page, **{id_name: _id}))
+                        page = []
+                if page:
+                    await queue.put(self._observations_to_columns(page, **{id_name: _id}))
+
+        async def fetch_all():
+            fetches = [asyncio.ensure_future(fetch(_id)) for _id in ids]
+            try:
+                await asyncio.gather(*fetches)
+            except asyncio.CancelledError:
+                # The consumer stopped early: nothing reads the queue anymore, so there is no one to wake up
+                raise
+            except Exception:
+                # Stop the other downloads, and wake up the consumer so that it gets to the error
+                for task in fetches:
+                    task.cancel()
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        producer = asyncio.create_task(fetch_all())
+        try:
+            while (columns := await queue.get()) is not None:
+                yield columns
+            await producer
+        finally:
+            # Wait for the downloads to be cancelled, releasing their connections, when the consumer stops early
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    def _observations_to_columns(self, page, **columns):
+        with measure(self.telemetry, "parse", rows=len(page)):
+            return observations_to_columns(page, **columns)
+
+    async def get_observation_batches(self, tz="UTC", **kwargs):
+        """
+        Download observations for several ids concurrently, at most `tcp_limit` ids at a time, and yield them page by
+        page as typed GeoDataFrames.
+        Parameters
+        ----------
+        tz : str, optional
+            The timezone to return observation times in
+        kwargs
+            Parameters accepted by `get_observations`. The ids may be a str or a list[str].
+        Returns
+        -------
+        An async generator of gpd.GeoDataFrame, one per page, in the order pages are received
+        """
+        async for columns in self._iter_observation_columns(**kwargs):
+            observations = concat_observation_columns([columns])
+            observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
+            observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+            yield observations
+
+    async def get_relocations(self, tz="UTC", **kwargs):
+        """
+        Download observations for several ids concurrently and collect them into a `Relocations`, concatenating the
+        received pages once at the end.
+        Parameters
+        ----------
+        tz : str, optional
+            The timezone to return observation times in
+        kwargs
+            Parameters accepted by `get_observations`. The ids may be a str or a list[str].
+        Returns
+        -------
+        relocations : ecoscope.base.Relocations
+        """
+        groupby_col = next(
+            col
+            for ids, col in [
+                ("source_ids", "source"),
+                ("subject_ids", "subject_id"),
+                ("subjectsource_ids", "subjectsource_id"),
+            ]
+            if kwargs.get(ids) is not None
+        )
+        batches = [columns async for columns in self._iter_observation_columns(**kwargs)]
+
+        with measure(self.telemetry, "to_gdf") as counters:
+            observations = concat_observation_columns(batches)
+            if observations.empty:
+                return gpd.GeoDataFrame()
+
+            observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
+            observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+            observations.sort_values("recorded_at", inplace=True)
+            counters["rows"] = len(observations)
+
+        with measure(self.telemetry, "relocations", rows=len(observations)):
+            return ecoscope.base.Relocations.from_gdf(
+                observations,
+                groupby_col=groupby_col,
+                uuid_col="id",
+                time_col="recorded_at",
+            )
+
     async def get_patrol_observations_with_patrol_filter(
         self,
         since=None,
@@ -413,19 +632,44 @@ class AsyncEarthRangerIO(AsyncERClient):
             Whether to merge patrol details into dataframe
         kwargs
             Additional parameters to pass to `_get_observations_by_patrol`.
+        Patrols are downloaded by `tcp_limit` concurrent workers. See `get_request_latency_stats` for the latency of
+        the requests made.
         Returns
         -------
         relocations : ecoscope.base.Relocations
         """
-        observations = ecoscope.base.Relocations()
         df_pt = await self.get_patrol_types_dataframe() if include_patrol_details else None
 
-        tasks = []
-        async for patrol in self.get_patrols(since=since, until=until, patrol_type=patrol_type, status=status):
-            task = asyncio.create_task(self._get_observations_by_patrol(patrol, relocations, tz, df_pt, **kwargs))
-            tasks.append(task)
-
-        observations = await asyncio.gather(*tasks)
+        # A pool of `tcp_limit` workers downloads patrols while more are being listed. The queue is bounded so that
+        # listing doesn't run far ahead of the downloads.
+        queue = asyncio.Queue(maxsize=2 * self.tcp_limit)
+        results = []
+
+        async def worker():
+            while (item := await queue.get()) is not None:
+                i, patrol = item
+                results.append((i, await self._get_observations_by_patrol(patrol, relocations, tz, df_pt, **kwargs)))
+
+        async def list_patrols():
+            i = 0
+            async for patrol in self.get_patrols(since=since, until=until, patrol_type=patrol_type, status=status):
+                await queue.put((i, patrol))
+                i += 1
+            for _ in range(self.tcp_limit):
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(list_patrols())] + [asyncio.create_task(worker()) for _ in range(self.tcp_limit)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        observations = [observations for _, observations in sorted(results, key=lambda result: result[0])]
+        observations = [o for o in observations if not o.empty]
+        if not observations:
+            return ecoscope.base.Relocations()
         observations = pd.concat(observations)
 
         if include_patrol_details:
@@ -452,7 +696,7 @@ class AsyncEarthRangerIO(AsyncERClient):
         -------
         relocations : ecoscope.base.Relocations
         """
-        observations = ecoscope.base.Relocations()
+        observations = []
         for patrol_segment in patrol["patrol_segments"]:
             subject_id = (patrol_segment.get("leader") or {}).get("id")
             patrol_start_time = (patrol_segment.get("time_range") or {}).get("start_time")
@@ -517,14 +761,17 @@ class AsyncEarthRangerIO(AsyncERClient):
                     observations_by_subject.set_index("id", inplace=True)
 
                 if len(observations_by_subject) > 0:
-                    observations = pd.concat([observations, observations_by_subject])
+                    observations.append(observations_by_subject)
 
             except Exception as e:
-                print(
-                    f"Getting observations for subject_id={subject_id} start_time={patrol_start_time}"
+                self.logger.warning(
+                    f"Getting observations for subject_id={subject_id} start_time={patrol_start_time} "
                     f"end_time={patrol_end_time} failed for: {e}"
                 )
-        return observations
+
+        if not observations:
+            return ecoscope.base.Relocations()
+        return pd.concat(observations)
 
     async def get_events_dataframe(
         self,
@@ -627,18 +874,19 @@ class AsyncEarthRangerIO(AsyncERClient):
         async for event in self.get_events(**params):
             events.append(event)
 
-        df = pd.DataFrame(events)
-        df = clean_time_cols(df)
+        with measure(self.telemetry, "parse", rows=len(events)):
+            df = pd.DataFrame(events)
+        with measure(self.telemetry, "clean_time_cols", rows=len(df)):
+            df = clean_time_cols(df)
         gdf = gpd.GeoDataFrame(df)
-        if gdf.loc[0, "location"] is not None:
-            gdf.loc[~gdf["geojson"].isna(), "geometry"] = gpd.GeoDataFrame.from_features(
-                gdf.loc[~gdf["geojson"].isna(), "geojson"]
-            )["geometry"]
-            gdf.set_geometry("geometry", inplace=True)
-            gdf.set_crs(4326, inplace=True)
-
-        gdf.sort_values("time", inplace=True)
-        gdf.set_index("id", inplace=True)
+        if gdf.empty:
+            return gdf
+        with measure(self.telemetry, "to_gdf", rows=len(gdf)):
+            if "geojson" in gdf.columns:
+                gdf = gdf.set_geometry(geojson_to_geometry(gdf["geojson"]))
+
+            gdf.sort_values("time", inplace=True)
+            gdf.set_index("id", inplace=True)
         return gdf
 
     async def get_event_types(self, include_inactive=False, **addl_kwargs):
@@ -0,0 +1,79 @@
+import datetime
+import hashlib
+import json
+import os
+
+
+class DownloadCheckpoint:
+    """
+    A spill directory in which the records of each completed query of a long download are persisted, so that a rerun
+    of the same download only requests the queries that didn't complete.
+
+    Each query (e.g. the observations of one subject in one time window) is identified by its endpoint and query
+    parameters. Its records are written to `<path>/<key>.json` once all of its pages are received, and a manifest
+    (`<path>/_manifest.json`) records the endpoint, parameters and number of records of every completed query.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Spill directory
+    """
+
+    MANIFEST_FILE = "_manifest.json"
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, self.MANIFEST_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_json(self, filename, data):
+        path = os.path.join(self.path, filename)
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def make_key(object, params):
+        query = json.dumps({"object": object.strip("/"), "params": params}, sort_keys=True, default=str)
+        return hashlib.sha1(query.encode()).hexdigest()
+
+    def __contains__(self, key):
+        return key in self.manifest
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def load(self, key):
+        """The records saved for the query `key`."""
+        with open(os.path.join(self.path, self.manifest[key]["file"])) as f:
+            return json.load(f)
+
+    def save(self, key, records, object, params):
+        """Persist the records of the completed query `key`, then record it in the manifest."""
+        filename = f"{key}.json"
+        self._write_json(filename, records)
+        self.manifest[key] = {
+            "object": object.strip("/"),
+            "params": json.loads(json.dumps(params, default=str)),
+            "rows": len(records),
+            "file": filename,
+            "fetched_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        self._write_json(self.MANIFEST_FILE, self.manifest)
+
+    def clear(self):
+        """Forget every completed query and remove its records."""
+        for entry in self.manifest.values():
+            try:
+                os.remove(os.path.join(self.path, entry["file"]))
+            except FileNotFoundError:
+                pass
+        self.manifest = {}
+        self._write_json(self.MANIFEST_FILE, self.manifest)
@@ -1,31 +1,69 @@
+import asyncio
+import collections
+import concurrent.futures
 import datetime
+import functools
+import itertools
 import json
 import math
+import time
 import typing
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import backoff
 import pytz
 import requests
-from erclient.client import ERClient, ERClientException, ERClientNotFound
-from shapely.geometry import shape
+from erclient.client import (
+    ERClient,
+    ERClientBadCredentials,
+    ERClientException,
+    ERClientNotFound,
+    ERClientPermissionDenied,
+)
 from tqdm.auto import tqdm
 
 import ecoscope
 from ecoscope.io.earthranger_utils import (
+    AdaptivePageSize,
+    aoi_bbox,
     clean_kwargs,
     clean_time_cols,
+    coalesce_time_ranges,
+    concat_observation_columns,
     dataframe_to_dict,
     format_iso_time,
-    to_gdf,
+    geojson_to_geometry,
+    MetadataCache,
+    observations_to_columns,
+    observations_to_records,
+    points_within,
     to_hex,
-    pack_columns,
 )
+from ecoscope.io.checkpoint import DownloadCheckpoint
+from ecoscope.io.telemetry import measure, measure_decode, record_response
+from ecoscope.io.utils import BackgroundEventLoop, PooledSession
 
 
 class EarthRangerIO(ERClient):
-    def __init__(self, sub_page_size=4000, tcp_limit=5, **kwargs):
+    def __init__(
+        self,
+        sub_page_size=4000,
+        tcp_limit=5,
+        metadata_cache_ttl=None,
+        metadata_cache_maxsize=256,
+        pool_size=None,
+        http_retries=2,
+        gzip=True,
+        backend="threads",
+        telemetry=None,
+        **kwargs,
+    ):
+        if backend not in ("threads", "async"):
+            raise ValueError("backend must be 'threads' or 'async'")
+        connection_kwargs = dict(kwargs)
+
         if "server" in kwargs:
             server = kwargs.pop("server")
             kwargs["service_root"] = f"{server}/api/v1.0"
@@ -33,9 +71,44 @@ class EarthRangerIO(ERClient):
 
         self.sub_page_size = sub_page_size
         self.tcp_limit = tcp_limit
+        # With `metadata_cache_ttl` set, responses of metadata endpoints (subjects, sources, patrol and event types...)
+        # are reused for that many seconds, or until this client writes anything. Off by default, as some of them
+        # (e.g. the `last_position` of subjects or the state of patrols) go stale.
+        self.metadata_cache = MetadataCache(metadata_cache_maxsize, metadata_cache_ttl) if metadata_cache_ttl else None
         kwargs["client_id"] = kwargs.get("client_id", "das_web_client")
         super().__init__(**kwargs)
 
+        # Every request of this client, including logins, goes through one pool of keep-alive connections sized for
+        # the `tcp_limit` threads sharing it. Pass it to `ecoscope.io.download_file` to reuse it for downloads.
+        self.session = PooledSession(pool_size or tcp_limit, retries=http_retries, gzip=gzip)
+        self._http_session = self.session
+
+        # An `ecoscope.io.telemetry.Telemetry` timing each request and processing stage of downloads, in place of
+        # their progress bars
+        self.telemetry = telemetry
+        if telemetry is not None:
+            self.session.hooks["response"].append(functools.partial(record_response, telemetry))
+
+        # With the async backend, pages are downloaded by an `AsyncEarthRangerIO` running on a background event loop
+        # instead of by a pool of `tcp_limit` threads. Other requests keep going through `session`.
+        self.backend = backend
+        self._event_loop = None
+        self._async_io = None
+        if backend == "async":
+            from ecoscope.io.async_earthranger import AsyncEarthRangerIO
+
+            self._event_loop = BackgroundEventLoop()
+            self._async_io = self._event_loop.run(
+                AsyncEarthRangerIO.create(
+                    sub_page_size=sub_page_size,
+                    tcp_limit=tcp_limit,
+                    metadata_cache_ttl=metadata_cache_ttl,
+                    metadata_cache_maxsize=metadata_cache_maxsize,
+                    telemetry=telemetry,
+                    **connection_kwargs,
+                )
+            )
+
         if not self.auth:
             try:
                 self.login()
@@ -48,7 +121,7 @@ class EarthRangerIO(ERClient):
                 raise ERClientException("Authorization token is invalid or expired.")
 
     def _token_request(self, payload):
-        response = requests.post(self.token_url, data=payload)
+        response = self.session.post(self.token_url, data=payload)
         if response.ok:
             self.auth = response.json()
             expires_in = int(self.auth["expires_in"]) - 5 * 60
@@ -59,6 +132,52 @@ class EarthRangerIO(ERClient):
         self.auth_expires = pytz.utc.localize(datetime.datetime.min)
         raise ERClientNotFound(response.json().get("error_description", "invalid token"))
 
+    def close(self):
+        """Close the async transport and stop its event loop, if the async backend is used."""
+        if self._async_io is not None:
+            self._event_loop.run(self._async_io.close())
+            self._event_loop.close()
+            self._async_io = None
+
+    def get_connection_stats(self):
+        """
+        Connection reuse of the client's HTTP session.
+        Returns
+        -------
+        stats : dict
+            Number of `requests` sent, `connections` opened and requests that `reused` a connection
+        """
+        return self.session.connection_stats()
+
+    def _get(self, path, *args, **kwargs):
+        if kwargs.get("stream") or kwargs.get("return_response"):
+            return super()._get(path, *args, **kwargs)
+
+        cache = self.metadata_cache
+        if cache is None or not cache.is_cacheable(path):
+            with measure_decode(self.telemetry):
+                return super()._get(path, *args, **kwargs)
+
+        key = cache.make_key(
+            path, args=args, **{k: v for k, v in kwargs.items() if k not in ("max_retries", "seconds_between_attempts")}
+        )
+        response = cache.get(key)
+        if response is None:
+            with measure_decode(self.telemetry):
+                response = super()._get(path, *args, **kwargs)
+            cache.put(key, response)
+        return response
+
+    def _call(self, *args, **kwargs):
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate()
+        return super()._call(*args, **kwargs)
+
+    def _delete(self, *args, **kwargs):
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate()
+        return super()._delete(*args, **kwargs)
+
     """
     GET Functions
     """
@@ -224,6 +343,216 @@ class EarthRangerIO(ERClient):
         df = clean_time_cols(df)
         return df
 
+    def _get_objects_for_queries(
+        self,
+        object,
+        queries,
+        max_pending=None,
+        desc=None,
+        page_sizer=None,
+        page_retries=0,
+        counts=None,
+        checkpoint=None,
+        errors=None,
+    ):
+        """
+        Fetch every page of `object` for each of `queries` through a single pool of `tcp_limit` workers.
+        The page counts of all queries are requested first, then the page requests of every query are scheduled
+        together so that large or slow queries don't hold back the others.
+        Parameters
+        ----------
+        object : str
+            Endpoint to query, e.g. "observations/"
+        queries : dict
+            Query parameters of each query, by key
+        max_pending : int, optional
+            Maximum number of pages requested but not yet consumed. Defaults to twice `tcp_limit`.
+        desc : str, optional
+            Description of the progress bar
+        page_sizer : ecoscope.io.earthranger_utils.AdaptivePageSize, optional
+            If given, the page size of each query is picked from it when the query's first page is scheduled, and it
+            is fed the duration and records of every page. Defaults to a fixed `sub_page_size`.
+        page_retries : int, optional
+            Number of times a failed page is requested again before giving up
+        counts : dict, optional
+            Number of objects of the queries for which it is already known. The others are counted first.
+        checkpoint : str or PathLike or ecoscope.io.DownloadCheckpoint, optional
+            Spill directory where the records of each query are saved once all its pages are received. Queries
+            already saved there aren't requested again, their records are yielded first as a single page.
+        errors : dict, optional
+            If given, a query whose count or pages still fail after `page_retries` is recorded in it with the
+            exception, instead of raising it, and the rest of its pages are skipped. Pages of that query yielded
+            before it failed are incomplete and should be discarded.
+        Yields
+        -------
+        (key, results) : tuple
+            The key of the query and the list of records of each page, in completion order
+        """
+
+        max_pending = max_pending or 2 * self.tcp_limit
+        async_io = self._async_io
+
+        spill = {}
+        if checkpoint is not None:
+            if not isinstance(checkpoint, DownloadCheckpoint):
+                checkpoint = DownloadCheckpoint(checkpoint)
+            checkpoint_keys = {key: DownloadCheckpoint.make_key(object, params) for key, params in queries.items()}
+            for key, params in queries.items():
+                if checkpoint_keys[key] in checkpoint:
+                    results = checkpoint.load(checkpoint_keys[key])
+                    if results:
+                        yield key, results
+            queries = {key: params for key, params in queries.items() if checkpoint_keys[key] not in checkpoint}
+
+        # Number of pages of each query not received yet, and the records received so far when checkpointing
+        remaining = {}
+        failed = errors if errors is not None else {}
+
+        def fail(key, exc):
+            if errors is None:
+                raise exc
+            failed[key] = exc
+            spill.pop(key, None)
+
+        def received(key, results):
+            remaining[key] -= 1
+            if checkpoint is not None:
+                spill[key].extend(results)
+                if remaining[key] == 0:
+                    checkpoint.save(checkpoint_keys[key], spill.pop(key), object, queries[key])
+
+        def get_page(params):
+            with measure(self.telemetry, "page") as counters:
+                start = time.perf_counter()
+                results = self._get(object, params=params)["results"]
+                counters.update(pages=1, rows=len(results))
+            if page_sizer is not None:
+                page_sizer.observe(results, time.perf_counter() - start)
+            return results
+
+        # Like the thread pool, the async transport sends at most `tcp_limit` requests at a time
+        semaphore = asyncio.Semaphore(self.tcp_limit)
+
+        async def get_page_async(params):
+            async with semaphore:
+                with measure(self.telemetry, "page") as counters:
+                    start = time.perf_counter()
+                    results = (await async_io._get(object, params=params))["results"]
+                    counters.update(pages=1, rows=len(results))
+            if page_sizer is not None:
+                page_sizer.observe(results, time.perf_counter() - start)
+            return results
+
+        def get_count(params):
+            return self._get_objects_count({**params, "object": object})
+
+        async def get_count_async(params):
+            async with semaphore:
+                response = await async_io._get(object, params={**params, "page": 1, "page_size": 1})
+            return (response or {}).get("count") or 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.tcp_limit) as executor:
+
+            def submit_request(func, async_func, params):
+                if async_io is not None:
+                    return self._event_loop.submit(async_func(params))
+                return executor.submit(func, params)
+
+            counts = dict(counts or {})
+            futures = {
+                key: submit_request(get_count, get_count_async, params)
+                for key, params in queries.items()
+                if key not in counts
+            }
+            for key, future in futures.items():
+                try:
+                    counts[key] = future.result()
+                except Exception as exc:
+                    fail(key, exc)
+
+            pbar = tqdm(total=0, desc=desc or f"Downloading {object.strip('/')}", disable=self.telemetry is not None)
+
+            def plan():
+                # Pages of a query are only planned when the query is reached, so that it gets the current page size
+                for key, params in queries.items():
+                    if key in failed:
+                        continue
+                    page_size = page_sizer.size if page_sizer is not None else self.sub_page_size
+                    pages = math.ceil(counts[key] / page_size)
+                    pbar.total += pages
+                    pbar.refresh()
+                    remaining[key] = pages
+                    if checkpoint is not None:
+                        spill[key] = []
+                        if pages == 0:
+                            checkpoint.save(checkpoint_keys[key], [], object, params)
+                    for page in range(1, pages + 1):
+                        yield key, {**params, "page": page, "page_size": page_size}
+
+            # Pages of queries that failed since they were planned are dropped
+            tasks = (task for task in plan() if task[0] not in failed)
+            pending = {}
+            retries = collections.Counter()
+
+            def submit():
+                for key, params in itertools.islice(tasks, max_pending - len(pending)):
+                    pending[submit_request(get_page, get_page_async, params)] = key, params
+
+            try:
+                submit()
+                while pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        key, params = pending.pop(future)
+                        try:
+                            results = future.result()
+                        except Exception as exc:
+                            retries[key, params["page"]] += 1
+                            if retries[key, params["page"]] > page_retries:
+                                fail(key, exc)
+                                continue
+                            if self.telemetry is not None:
+                                self.telemetry.record("page", retries=1)
+                            pending[submit_request(get_page, get_page_async, params)] = key, params
+                            continue
+                        pbar.update()
+                        if key in failed:
+                            continue
+                        received(key, results)
+                        yield key, results
+                    submit()
+            finally:
+                for future in pending:
+                    future.cancel()
+                pbar.close()
+
+    def _get_objects_for_ids(self, object, id_name, ids, params, max_pending=None):
+        """
+        Fetch every page of `object` for each of `ids`. See `_get_objects_for_queries`.
+        Parameters
+        ----------
+        object : str
+            Endpoint to query, e.g. "observations/"
+        id_name : str
+            Name of the query parameter the ids are passed as
+        ids : list[str]
+        params : dict
+            Query parameters shared by all requests
+        max_pending : int, optional
+            Maximum number of pages requested but not yet consumed. Defaults to twice `tcp_limit`.
+        Yields
+        -------
+        (id, results) : tuple
+            The id and the list of records of each page, in completion order
+        """
+
+        return self._get_objects_for_queries(
+            object,
+            {_id: {**params, id_name: _id} for _id in ids},
+            max_pending=max_pending,
+            desc=f"Downloading {object.strip('/')} for {len(ids)} {id_name}s",
+        )
+
     def _get_observations(
         self,
         source_ids=None,
@@ -235,6 +564,9 @@ class EarthRangerIO(ERClient):
         filter=None,
         include_details=None,
         created_after=None,
+        observations_per_window=None,
+        adaptive_page_size=False,
+        checkpoint=None,
         **addl_kwargs,
     ):
         """
@@ -258,11 +590,22 @@ class EarthRangerIO(ERClient):
             automatically filtered data)
         include_details: one of [true,false], default is false. This brings back the observation additional field
         created_after: get observations created (saved in EarthRanger) after this ISO8061 date, include timezone
+        observations_per_window: if set and `since` is given, split the `since`/`until` range of each id into time
+            windows expected to hold about this many observations, based on a count of the whole range. Windows are
+            downloaded concurrently and their failed pages are retried.
+        adaptive_page_size: tune the page size from the download time and size of previous pages instead of using
+            `sub_page_size` throughout
+        checkpoint: spill directory (or `ecoscope.io.DownloadCheckpoint`) in which the observations of each id, or
+            time window of an id, are saved once downloaded. Running the same query again only downloads what isn't
+            saved yet. Requires an explicit `until`, so that the queries of a rerun (and their time windows) are the
+            same and what was saved before is consistent with what is downloaded after.
         Returns
         -------
         observations : gpd.GeoDataFrame
         """
         assert (source_ids, subject_ids, subjectsource_ids).count(None) == 2
+        if checkpoint is not None and until is None:
+            raise ValueError("`checkpoint` requires an explicit `until`")
 
         params = clean_kwargs(
             addl_kwargs,
@@ -280,33 +623,83 @@ class EarthRangerIO(ERClient):
         else:
             id_name, ids = "subjectsource_id", subjectsource_ids
 
-        observations = []
-        pbar = tqdm([ids] if isinstance(ids, str) else ids)
+        ids = list(dict.fromkeys([ids] if isinstance(ids, str) else ids))
+        partitioned = bool(observations_per_window) and since is not None
+        counts = None
+        if partitioned:
+            queries, counts = self._partition_observation_queries(id_name, ids, params, observations_per_window)
+        else:
+            queries = {(_id, 0): {**params, id_name: _id} for _id in ids}
+
+        batches = []
+        for key, results in self._get_objects_for_queries(
+            "observations/",
+            queries,
+            desc=f"Downloading observations for {len(ids)} {id_name}s",
+            page_sizer=AdaptivePageSize(self.sub_page_size) if adaptive_page_size else None,
+            page_retries=2 if partitioned else 0,
+            counts=counts,
+            checkpoint=checkpoint,
+        ):
+            with measure(self.telemetry, "parse", rows=len(results)):
+                batches.append(observations_to_columns(results, **{id_name: key[0]}))
+
+        with measure(self.telemetry, "to_gdf") as counters:
+            observations = concat_observation_columns(batches)
+            if observations.empty:
+                return gpd.GeoDataFrame()
+            if partitioned:
+                observations = observations.drop_duplicates("id", ignore_index=True)
+
+            observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
+            observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+
+            observations.sort_values("recorded_at", inplace=True)
+            counters["rows"] = len(observations)
+        return observations
+
+    def _partition_observation_queries(self, id_name, ids, params, observations_per_window):
+        """
+        Split the `since`/`until` range of each id into consecutive time windows of equal length, as many as needed
+        for each to hold about `observations_per_window` observations given the count of the whole range.
+        Returns
+        -------
+        queries : dict
+            Query parameters by (id, window number)
+        counts : dict
+            Number of observations of the queries of ids that fit in a single window, which is the count of the whole
+            range. Windows of ids split in several aren't counted yet.
+        """
 
-        for _id in pbar:
-            params[id_name] = _id
-            pbar.set_description(f"Downloading Observations for {id_name}={_id}")
-            dataframe = pd.DataFrame(
-                self.get_objects_multithreaded(
-                    object="observations/",
-                    threads=self.tcp_limit,
-                    page_size=self.sub_page_size,
-                    **params,
-                )
-            )
-            dataframe[id_name] = _id
-            observations.append(dataframe)
+        def to_utc(t):
+            t = pd.Timestamp(t)
+            return t.tz_localize("UTC") if t.tz is None else t.tz_convert("UTC")
 
-        observations = pd.concat(observations)
-        if observations.empty:
-            return gpd.GeoDataFrame()
+        start = to_utc(params["since"])
+        end = to_utc(params["until"]) if params.get("until") else pd.Timestamp.now(tz="UTC")
 
-        observations = clean_time_cols(observations)
-        observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
-        observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.tcp_limit) as executor:
+            counts = executor.map(
+                lambda _id: self._get_objects_count({**params, id_name: _id, "object": "observations/"}), ids
+            )
 
-        observations.sort_values("recorded_at", inplace=True)
-        return to_gdf(observations)
+            queries = {}
+            window_counts = {}
+            for _id, count in zip(ids, counts):
+                n = max(1, math.ceil(count / observations_per_window))
+                if n == 1:
+                    window_counts[_id, 0] = count
+                edges = pd.date_range(start, end, periods=n + 1)
+                for i in range(n):
+                    # Windows don't overlap: all but the last one stop just before the next one starts
+                    until = edges[i + 1] - pd.Timedelta(microseconds=1) if i < n - 1 else edges[i + 1]
+                    queries[_id, i] = {
+                        **params,
+                        id_name: _id,
+                        "since": edges[i].isoformat(),
+                        "until": until.isoformat(),
+                    }
+        return queries, window_counts
 
     def get_source_observations(self, source_ids, include_source_details=False, relocations=True, **kwargs):
         """
@@ -333,22 +726,63 @@ class EarthRangerIO(ERClient):
         if observations.empty:
             return gpd.GeoDataFrame()
 
+        if include_source_details:
+            with measure(self.telemetry, "merge_details"):
+                observations = observations.merge(
+                    pd.DataFrame(self.get_sources(id=",".join(observations["source"].unique()))).add_prefix("source__"),
+                    left_on="source",
+                    right_on="source__id",
+                )
+
+        if relocations:
+            with measure(self.telemetry, "relocations", rows=len(observations)):
+                return ecoscope.base.Relocations.from_gdf(
+                    observations,
+                    groupby_col="source",
+                    uuid_col="id",
+                    time_col="recorded_at",
+                )
+        else:
+            return observations
+
+    def _merge_observation_details(
+        self,
+        observations,
+        subject_ids,
+        include_source_details=False,
+        include_subject_details=False,
+        include_subjectsource_details=False,
+    ):
         if include_source_details:
             observations = observations.merge(
-                pd.DataFrame(self.get_sources(id=",".join(observations["source"].unique()))).add_prefix("source__"),
+                self.get_sources(id=",".join(observations["source"].unique())).add_prefix("source__"),
                 left_on="source",
                 right_on="source__id",
             )
+        if include_subject_details:
+            if isinstance(subject_ids, pd.DataFrame):
+                observations = observations.merge(
+                    subject_ids.add_prefix("subject__"),
+                    left_on="subject_id",
+                    right_on="subject__id",
+                )
+            else:
+                observations = observations.merge(
+                    self.get_subjects(id=",".join(subject_ids), include_inactive=True).add_prefix("subject__"),
+                    left_on="subject_id",
+                    right_on="subject__id",
+                )
 
-        if relocations:
-            return ecoscope.base.Relocations.from_gdf(
-                observations,
-                groupby_col="source",
-                uuid_col="id",
-                time_col="recorded_at",
+        if include_subjectsource_details:
+            observations = observations.merge(
+                self.get_subjectsources(subjects=",".join(observations["subject_id"].unique())).add_prefix(
+                    "subjectsource__"
+                ),
+                left_on=["subject_id", "source"],
+                right_on=["subjectsource__subject", "subjectsource__source"],
             )
-        else:
-            return observations
+
+        return observations
 
     def get_subject_observations(
         self,
@@ -357,6 +791,7 @@ class EarthRangerIO(ERClient):
         include_subject_details=False,
         include_subjectsource_details=False,
         relocations=True,
+        aoi=None,
         **kwargs,
     ):
         """
@@ -371,6 +806,8 @@ class EarthRangerIO(ERClient):
             Whether to merge subject info into dataframe
         include_subjectsource_details : bool, optional
             Whether to merge subjectsource info into dataframe
+        aoi : shapely.Geometry or gpd.GeoSeries or gpd.GeoDataFrame, optional
+            Only keep observations within this area of interest (in EPSG:4326 if a shapely geometry)
         kwargs
             Additional arguments to pass in the request to EarthRanger. See the docstring of `__get_observations` for
             info.
@@ -388,46 +825,31 @@ class EarthRangerIO(ERClient):
             raise ValueError(f"subject_ids must be either a str or list[str] or pd.DataFrame, not {type(subject_ids)}")
 
         observations = self._get_observations(subject_ids=subject_ids, **kwargs)
+        if aoi is not None and not observations.empty:
+            with measure(self.telemetry, "filter") as counters:
+                observations = observations[points_within(observations.geometry.values, aoi)].reset_index(drop=True)
+                counters["rows"] = len(observations)
 
         if observations.empty:
             return gpd.GeoDataFrame()
 
-        if include_source_details:
-            observations = observations.merge(
-                self.get_sources(id=",".join(observations["source"].unique())).add_prefix("source__"),
-                left_on="source",
-                right_on="source__id",
-            )
-        if include_subject_details:
-            if isinstance(subject_ids, pd.DataFrame):
-                observations = observations.merge(
-                    subject_ids.add_prefix("subject__"),
-                    left_on="subject_id",
-                    right_on="subject__id",
-                )
-            else:
-                observations = observations.merge(
-                    self.get_subjects(id=",".join(subject_ids), include_inactive=True).add_prefix("subject__"),
-                    left_on="subject_id",
-                    right_on="subject__id",
-                )
-
-        if include_subjectsource_details:
-            observations = observations.merge(
-                self.get_subjectsources(subjects=",".join(observations["subject_id"].unique())).add_prefix(
-                    "subjectsource__"
-                ),
-                left_on=["subject_id", "source"],
-                right_on=["subjectsource__subject", "subjectsource__source"],
+        with measure(self.telemetry, "merge_details"):
+            observations = self._merge_observation_details(
+                observations,
+                subject_ids,
+                include_source_details=include_source_details,
+                include_subject_details=include_subject_details,
+                include_subjectsource_details=include_subjectsource_details,
             )
 
         if relocations:
-            return ecoscope.base.Relocations.from_gdf(
-                observations,
-                groupby_col="subject_id",
-                uuid_col="id",
-                time_col="recorded_at",
-            )
+            with measure(self.telemetry, "relocations", rows=len(observations)):
+                return ecoscope.base.Relocations.from_gdf(
+                    observations,
+                    groupby_col="subject_id",
+                    uuid_col="id",
+                    time_col="recorded_at",
+                )
         else:
             return observations
 
@@ -464,19 +886,21 @@ class EarthRangerIO(ERClient):
             return gpd.GeoDataFrame()
 
         if include_source_details:
-            observations = observations.merge(
-                pd.DataFrame(self.get_sources(id=",".join(observations["source"].unique()))).add_prefix("source__"),
-                left_on="source",
-                right_on="source__id",
-            )
+            with measure(self.telemetry, "merge_details"):
+                observations = observations.merge(
+                    pd.DataFrame(self.get_sources(id=",".join(observations["source"].unique()))).add_prefix("source__"),
+                    left_on="source",
+                    right_on="source__id",
+                )
 
         if relocations:
-            return ecoscope.base.Relocations.from_gdf(
-                observations,
-                groupby_col="subjectsource_id",
-                uuid_col="id",
-                time_col="recorded_at",
-            )
+            with measure(self.telemetry, "relocations", rows=len(observations)):
+                return ecoscope.base.Relocations.from_gdf(
+                    observations,
+                    groupby_col="subjectsource_id",
+                    uuid_col="id",
+                    time_col="recorded_at",
+                )
         else:
             return observations
 
@@ -485,6 +909,9 @@ class EarthRangerIO(ERClient):
         subject_group_id=None,
         subject_group_name=None,
         include_inactive=True,
+        aoi=None,
+        since=None,
+        until=None,
         **kwargs,
     ):
         """
@@ -496,6 +923,13 @@ class EarthRangerIO(ERClient):
             Common name of subject group to filter by
         include_inactive : bool, optional
             Whether to get observations for Subjects marked inactive by EarthRanger
+        aoi : shapely.Geometry or gpd.GeoSeries or gpd.GeoDataFrame, optional
+            Only get observations within this area of interest (in EPSG:4326 if a shapely geometry). Only subjects
+            with track data within its bounding box are queried, and the observations are then filtered to the AOI.
+        since : str, optional
+            Lower time range. Subjects without a position since then aren't queried.
+        until : str, optional
+            Upper time range
         kwargs
             Additional arguments to pass in the request to `get_subject_observations`. See the docstring of
             `get_subject_observations` for info.
@@ -507,12 +941,28 @@ class EarthRangerIO(ERClient):
 
         assert (subject_group_id is None) != (subject_group_name is None)
 
+        bbox = aoi_bbox(aoi) if aoi is not None else None
         if subject_group_id:
-            subjects = self.get_subjects(subject_group_id=subject_group_id, include_inactive=include_inactive)
+            subjects = self.get_subjects(
+                subject_group_id=subject_group_id, include_inactive=include_inactive, bbox=bbox
+            )
         else:
-            subjects = self.get_subjects(subject_group_name=subject_group_name, include_inactive=include_inactive)
+            subjects = self.get_subjects(
+                subject_group_name=subject_group_name, include_inactive=include_inactive, bbox=bbox
+            )
+
+        # Subjects that can't have observations in the time range or AOI. Without either, every subject is queried.
+        windowed = aoi is not None or since is not None or until is not None
+        if windowed and not subjects.empty and "tracks_available" in subjects:
+            subjects = subjects[subjects["tracks_available"].fillna(True).astype(bool)]
+        if not subjects.empty and since is not None and "last_position_date" in subjects:
+            since_utc = pd.Timestamp(since)
+            since_utc = since_utc.tz_localize("UTC") if since_utc.tz is None else since_utc
+            subjects = subjects[~(subjects["last_position_date"] < since_utc)]
+        if subjects.empty:
+            return gpd.GeoDataFrame()
 
-        return self.get_subject_observations(subjects, **kwargs)
+        return self.get_subject_observations(subjects, aoi=aoi, since=since, until=until, **kwargs)
 
     def get_event_types(self, include_inactive=False, **addl_kwargs):
         params = clean_kwargs(addl_kwargs, include_inactive=include_inactive)
@@ -541,6 +991,8 @@ class EarthRangerIO(ERClient):
         event_category=None,
         since=None,
         until=None,
+        window=None,
+        checkpoint=None,
         **addl_kwargs,
     ):
         """
@@ -580,11 +1032,19 @@ class EarthRangerIO(ERClient):
         event_category
         since
         until
+        window : str or pd.Timedelta, optional
+            Split the `since`/`until` range into windows of this length (e.g. "30D"), downloaded as separate queries
+        checkpoint : str or PathLike or ecoscope.io.DownloadCheckpoint, optional
+            Spill directory in which the events of each window are saved once downloaded. Running the same query
+            again only downloads the windows that aren't saved yet. Requires an explicit `until`, so that a rerun
+            doesn't return what was saved up to the end of the first run only.
         Returns
         -------
         events : gpd.GeoDataFrame
             GeoDataFrame of queried events
         """
+        if checkpoint is not None and until is None:
+            raise ValueError("`checkpoint` requires an explicit `until`")
 
         params = clean_kwargs(
             addl_kwargs,
@@ -616,26 +1076,39 @@ class EarthRangerIO(ERClient):
             filter["date_range"]["upper"] = until
             params["filter"] = json.dumps(filter)
 
-        df = pd.DataFrame(
-            self.get_objects_multithreaded(
-                object="activity/events/",
-                threads=self.tcp_limit,
-                page_size=self.sub_page_size,
-                **params,
-            )
-        )
-        gdf = gpd.GeoDataFrame(df)
+        queries = {0: params}
+        if window is not None:
+            if since is None or until is None:
+                raise ValueError("`window` requires both `since` and `until`")
+            edges = pd.date_range(pd.Timestamp(since), pd.Timestamp(until), freq=window)
+            edges = edges.append(pd.DatetimeIndex([pd.Timestamp(until)])).unique()
+            queries = {
+                i: {
+                    **params,
+                    "filter": json.dumps({"date_range": {"lower": lower.isoformat(), "upper": upper.isoformat()}}),
+                }
+                for i, (lower, upper) in enumerate(zip(edges[:-1], edges[1:]))
+            }
+
+        events = []
+        for _, results in self._get_objects_for_queries(
+            "activity/events/", queries, desc="Downloading events", checkpoint=checkpoint
+        ):
+            events.extend(results)
+        with measure(self.telemetry, "parse", rows=len(events)):
+            gdf = gpd.GeoDataFrame(pd.DataFrame(events))
 
         if not gdf.empty:
-            gdf = clean_time_cols(gdf)
-            if gdf.loc[0, "location"] is not None:
-                gdf.loc[~gdf["geojson"].isna(), "geometry"] = gpd.GeoDataFrame.from_features(
-                    gdf.loc[~gdf["geojson"].isna(), "geojson"]
-                )["geometry"]
-                gdf.set_geometry("geometry", inplace=True)
-                gdf.set_crs(4326, inplace=True)
-            gdf.sort_values("time", inplace=True)
-            gdf.set_index("id", inplace=True)
+            if window is not None:
+                # Events at the boundary of two windows are returned by both
+                gdf = gdf.drop_duplicates("id", ignore_index=True)
+            with measure(self.telemetry, "clean_time_cols", rows=len(gdf)):
+                gdf = clean_time_cols(gdf)
+            with measure(self.telemetry, "to_gdf", rows=len(gdf)):
+                if "geojson" in gdf.columns:
+                    gdf = gdf.set_geometry(geojson_to_geometry(gdf["geojson"]))
+                gdf.sort_values("time", inplace=True)
+                gdf.set_index("id", inplace=True)
 
         return gdf
 
@@ -749,8 +1222,8 @@ class EarthRangerIO(ERClient):
         if events_df.empty:
             return events_df
 
-        events_df["geometry"] = events_df["geojson"].apply(lambda x: shape(x.get("geometry")))
-        events_df["time"] = events_df["geojson"].apply(lambda x: x.get("properties").get("datetime"))
+        events_df["geometry"] = geojson_to_geometry(events_df["geojson"])
+        events_df["time"] = events_df["geojson"].str.get("properties").str.get("datetime")
         events_df = clean_time_cols(events_df)
 
         return gpd.GeoDataFrame(events_df, geometry="geometry", crs=4326)
@@ -853,6 +1326,8 @@ class EarthRangerIO(ERClient):
 
         observations = []
         df_pt = self.get_patrol_types()
+
+        segments = []
         for _, patrol in patrols_df.iterrows():
             for patrol_segment in patrol["patrol_segments"]:
                 subject_id = (patrol_segment.get("leader") or {}).get("id")
@@ -863,46 +1338,50 @@ class EarthRangerIO(ERClient):
 
                 if None in {subject_id, patrol_start_time}:
                     continue
+                segments.append((patrol, subject_id, patrol_start_time, patrol_end_time, patrol_type))
 
-                try:
-                    observation = self.get_subject_observations(
-                        subject_ids=[subject_id],
-                        since=patrol_start_time,
-                        until=patrol_end_time,
-                        **kwargs,
-                    )
-                    if include_patrol_details:
-                        observation["patrol_id"] = patrol["id"]
-                        observation["patrol_title"] = patrol["title"]
-                        observation["patrol_serial_number"] = patrol["serial_number"]
-                        observation["patrol_start_time"] = patrol_start_time
-                        observation["patrol_end_time"] = patrol_end_time
-                        observation["patrol_type"] = patrol_type
-                        observation = (
-                            observation.reset_index()
-                            .merge(
-                                pd.DataFrame(df_pt).add_prefix("patrol_type__"),
-                                left_on="patrol_type",
-                                right_on="id",
-                            )
-                            .drop(
-                                columns=[
-                                    "patrol_type__ordernum",
-                                    "patrol_type__icon_id",
-                                    "patrol_type__default_priority",
-                                    "patrol_type__is_active",
-                                ]
-                            )
+        segment_observations = self._get_patrol_segment_observations(
+            [(subject_id, start, end) for _, subject_id, start, end, _ in segments], **kwargs
+        )
+
+        for (patrol, subject_id, patrol_start_time, patrol_end_time, patrol_type), observation in zip(
+            segments, segment_observations
+        ):
+            try:
+                if include_patrol_details:
+                    observation["patrol_id"] = patrol["id"]
+                    observation["patrol_title"] = patrol["title"]
+                    observation["patrol_serial_number"] = patrol["serial_number"]
+                    observation["patrol_start_time"] = patrol_start_time
+                    observation["patrol_end_time"] = patrol_end_time
+                    observation["patrol_type"] = patrol_type
+                    observation = (
+                        observation.reset_index()
+                        .merge(
+                            pd.DataFrame(df_pt).add_prefix("patrol_type__"),
+                            left_on="patrol_type",
+                            right_on="id",
+                        )
+                        .drop(
+                            columns=[
+                                "patrol_type__ordernum",
+                                "patrol_type__icon_id",
+                                "patrol_type__default_priority",
+                                "patrol_type__is_active",
+                            ]
                         )
-                    if len(observation) > 0:
-                        observation["groupby_col"] = patrol["id"]
-                        observations.append(observation)
-                except Exception as e:
-                    print(
-                        f"Getting observations for subject_id={subject_id} start_time={patrol_start_time}"
-                        f"end_time={patrol_end_time} failed for: {e}"
                     )
+                if len(observation) > 0:
+                    observation["groupby_col"] = patrol["id"]
+                    observations.append(observation)
+            except Exception as e:
+                self.logger.warning(
+                    f"Getting observations for subject_id={subject_id} start_time={patrol_start_time} "
+                    f"end_time={patrol_end_time} failed for: {e}"
+                )
 
+        if not observations:
+            return ecoscope.base.Relocations()
         df = pd.concat(observations)
         df = clean_time_cols(df)
         df = ecoscope.base.Relocations(df)
@@ -910,6 +1389,116 @@ class EarthRangerIO(ERClient):
             return df.set_index("id")
         return df
 
+    def _get_patrol_segment_observations(
+        self,
+        segments,
+        tz="UTC",
+        include_source_details=False,
+        include_subject_details=False,
+        include_subjectsource_details=False,
+        relocations=True,
+        filter=None,
+        include_details=None,
+        created_after=None,
+        checkpoint=None,
+        **addl_kwargs,
+    ):
+        """
+        Download the observations of many (subject, time range) patrol segments at once.
+        Overlapping ranges of the same subject are coalesced into a single query, all queries are downloaded through
+        the shared page scheduler, and each segment is then sliced out of its query's observations with `searchsorted`
+        on `recorded_at`. A query that fails is logged as a warning and its segments are returned empty, the other
+        segments are still downloaded.
+        Parameters
+        ----------
+        segments : list[tuple]
+            (subject_id, start_time, end_time) of each segment. `end_time` may be None.
+        kwargs
+            See `get_subject_observations`
+        Returns
+        -------
+        observations : list
+            The observations of each segment, as `Relocations` if `relocations` is True, else GeoDataFrames. Segments
+            without observations get an empty GeoDataFrame.
+        """
+
+        def to_utc(t):
+            t = pd.Timestamp(t)
+            return t.tz_localize("UTC") if t.tz is None else t.tz_convert("UTC")
+
+        segments = [(subject_id, to_utc(start), end and to_utc(end)) for subject_id, start, end in segments]
+        fetches, membership = coalesce_time_ranges(segments)
+
+        params = clean_kwargs(addl_kwargs, filter=filter, include_details=include_details, created_after=created_after)
+        queries = {
+            i: {**params, **clean_kwargs(subject_id=subject_id, since=start.isoformat(), until=end and end.isoformat())}
+            for i, (subject_id, start, end) in enumerate(fetches)
+        }
+        batches = []
+        errors = {}
+        for i, results in self._get_objects_for_queries(
+            "observations/",
+            queries,
+            desc=f"Downloading observations for {len(segments)} patrol segments",
+            checkpoint=checkpoint,
+            errors=errors,
+        ):
+            with measure(self.telemetry, "parse", rows=len(results)):
+                batches.append((i, observations_to_columns(results, subject_id=fetches[i][0], _fetch=i)))
+
+        for i, exc in errors.items():
+            subject_id, start, end = fetches[i]
+            self.logger.warning(
+                f"Getting observations for subject_id={subject_id} start_time={start} end_time={end} failed for: {exc}"
+            )
+        batches = [columns for i, columns in batches if i not in errors]
+
+        with measure(self.telemetry, "to_gdf") as counters:
+            observations = concat_observation_columns(batches)
+            counters["rows"] = len(observations)
+        if observations.empty:
+            return [gpd.GeoDataFrame() for _ in segments]
+
+        with measure(self.telemetry, "merge_details"):
+            observations = self._merge_observation_details(
+                observations,
+                list(dict.fromkeys(subject_id for subject_id, _, _ in fetches)),
+                include_source_details=include_source_details,
+                include_subject_details=include_subject_details,
+                include_subjectsource_details=include_subjectsource_details,
+            )
+        observations = observations.sort_values(["_fetch", "recorded_at"], ignore_index=True)
+        observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
+        observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+
+        fetch = observations.pop("_fetch").to_numpy(dtype=np.int64)
+        times = observations["recorded_at"].array.asi8
+
+        segment_observations = []
+        for (_, start, end), i in zip(segments, membership):
+            if i in errors:
+                segment_observations.append(gpd.GeoDataFrame())
+                continue
+            lo, hi = np.searchsorted(fetch, [i, i + 1])
+            hi = hi if end is None else lo + np.searchsorted(times[lo:hi], end.value, side="right")
+            lo = lo + np.searchsorted(times[lo:hi], start.value, side="left")
+
+            observation = observations.iloc[lo:hi]
+            if observation.empty:
+                observation = gpd.GeoDataFrame()
+            elif relocations:
+                observation = ecoscope.base.Relocations.from_gdf(
+                    observation,
+                    groupby_col="subject_id",
+                    uuid_col="id",
+                    time_col="recorded_at",
+                )
+            else:
+                observation = observation.copy()
+            segment_observations.append(observation)
+
+        return segment_observations
+
     def get_patrol_segment_events(
         self,
         patrol_segment_id=None,
@@ -1121,13 +1710,7 @@ class EarthRangerIO(ERClient):
 
         def upload(obs):
             try:
-                obs = obs.rename(columns={source_id_col: "source", recorded_at_col: "recorded_at"})
-                obs["location"] = pd.DataFrame({"longitude": obs.geometry.x, "latitude": obs.geometry.y}).to_dict(
-                    "records"
-                )
-                del obs["geometry"]
-                obs = pack_columns(obs, columns=["source", "recorded_at", "location"])
-                post_data = obs.to_dict("records")
+                post_data = observations_to_records(obs, source_id_col, recorded_at_col)
                 results = super(EarthRangerIO, self).post_observation(post_data)
             except ERClientException as exc:
                 self.logger.error(exc)
@@ -1138,6 +1721,88 @@ class EarthRangerIO(ERClient):
 
         return observations.groupby(source_id_col, group_keys=False).apply(upload)
 
+    def post_observations_bulk(
+        self,
+        observations: gpd.GeoDataFrame,
+        source_id_col: str = "source",
+        recorded_at_col: str = "recorded_at",
+        chunk_size: int = 1000,
+        max_workers: int = None,
+        max_tries: int = 5,
+        backoff_factor: float = 1.0,
+    ) -> pd.DataFrame:
+        """
+        Upload a large number of observations in concurrent, size-bounded chunks.
+        Each source's observations are split into chunks of at most `chunk_size` records which are posted by a pool of
+        `max_workers` threads. Failed chunks are retried with exponential backoff, except for errors that can't be
+        fixed by retrying (bad credentials, permission denied, not found).
+
+        Parameters
+        ----------
+        observations : gpd.GeoDataFrame
+            observation data to be uploaded
+        source_id_col : str
+            The source column in the observation dataframe
+        recorded_at_col : str
+            The observation recorded time column in the dataframe
+        chunk_size : int
+            Maximum number of observations per request
+        max_workers : int, optional
+            Number of concurrent uploads. Defaults to `tcp_limit`.
+        max_tries : int
+            Maximum number of attempts per chunk
+        backoff_factor : float
+            Base delay in seconds of the exponential backoff between attempts
+
+        Returns
+        -------
+        report : pd.DataFrame
+            One row per chunk with its `source`, `index` (the labels of its rows in `observations`), `size`, `status`
+            ("success" or "failed"), number of `attempts` and `error`. Failed chunks can be retried with
+            `observations.loc[np.concatenate(report[report["status"] == "failed"]["index"])]`.
+        """
+
+        chunks = [
+            (source, positions[start : start + chunk_size])
+            for source, positions in observations.groupby(source_id_col, sort=False).indices.items()
+            for start in range(0, len(positions), chunk_size)
+        ]
+
+        def upload(source, positions):
+            attempts = 0
+
+            @backoff.on_exception(
+                backoff.expo,
+                (ERClientException, requests.exceptions.RequestException),
+                max_tries=max_tries,
+                factor=backoff_factor,
+                giveup=lambda e: isinstance(e, (ERClientBadCredentials, ERClientPermissionDenied, ERClientNotFound)),
+                logger=None,
+            )
+            def post(records):
+                nonlocal attempts
+                attempts += 1
+                return self._post("observations", payload=records)
+
+            index = observations.index[positions]
+            report = {"source": source, "index": list(index), "size": len(index), "status": "success", "error": None}
+            try:
+                post(observations_to_records(observations.iloc[positions], source_id_col, recorded_at_col))
+            except (ERClientException, requests.exceptions.RequestException) as exc:
+                self.logger.error(exc)
+                report.update(status="failed", error=str(exc))
+            report["attempts"] = attempts
+            return report
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or self.tcp_limit) as executor:
+            futures = [executor.submit(upload, source, positions) for source, positions in chunks]
+            reports = [
+                future.result()
+                for future in tqdm(futures, desc="Uploading observations", disable=self.telemetry is not None)
+            ]
+
+        return pd.DataFrame(reports, columns=["source", "index", "size", "status", "attempts", "error"])
+
     def post_event(
         self,
         events: typing.Union[gpd.GeoDataFrame, pd.DataFrame, typing.Dict, typing.List[typing.Dict]],
@@ -1,8 +1,28 @@
+import copy
+import json
+import threading
+import time
 import typing
+from collections import OrderedDict
+
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 from dateutil import parser
 
+# Endpoints whose responses change rarely enough to be cached by `MetadataCache`
+METADATA_PATHS = {
+    "activity/events/eventtypes",
+    "activity/patrols",
+    "activity/patrols/types",
+    "sources",
+    "subjectgroups",
+    "subjects",
+    "subjectsources",
+}
+METADATA_PATH_PREFIXES = ("activity/events/schema/",)
+
 TIME_COLS = ["time", "created_at", "updated_at", "end_time", "last_position_date", "recorded_at", "fixtime"]
 
 
@@ -12,41 +32,379 @@ def clean_kwargs(addl_kwargs={}, **kwargs):
     return {k: v for k, v in {**addl_kwargs, **kwargs}.items() if v is not None}
 
 
+def flatten_records(records, prefix=None, sep="__", index=None):
+    """
+    Flatten nested dicts into typed columns in a single pass over the records, without building an intermediate
+    frame per level. Nested keys are joined with `sep`, lists are kept as values, and values that aren't dicts
+    (e.g. a missing `event_details`) count as empty records.
+
+    The type of each column is inferred from its values: int64 or bool when every record has one, float64 for numbers
+    (missing values become NaN) and object otherwise.
+
+    Parameters
+    ----------
+    records : iterable of dict
+    prefix : str, optional
+        Prefix of the column names, joined to them with `sep`
+    sep : str
+        Separator of nested keys
+    index : pd.Index, optional
+        Index of the returned frame
+
+    Returns
+    -------
+    df : pd.DataFrame
+    """
+    columns = {}
+    # Rows and values of each column, by the key path leading to it
+    leaves = {}
+
+    def walk(record, path, row):
+        for key, value in record.items():
+            if isinstance(value, dict):
+                walk(value, (path, key), row)
+                continue
+            leaf = leaves.get((path, key))
+            if leaf is None:
+                name, node = key, path
+                while node is not None:
+                    node, parent = node
+                    name = f"{parent}{sep}{name}"
+                leaf = leaves[path, key] = columns.setdefault(name, ([], []))
+            leaf[0].append(row)
+            leaf[1].append(value)
+
+    n = 0
+    for n, record in enumerate(records, start=1):
+        if isinstance(record, dict):
+            walk(record, (None, prefix) if prefix is not None else None, n - 1)
+
+    data = {}
+    for key, (rows, values) in columns.items():
+        present = [value for value in values if value is not None]
+        types = {type(value) for value in present}
+        complete = len(present) == n
+        if types == {bool} and complete:
+            column = np.empty(n, dtype=bool)
+        elif types == {int} and complete:
+            column = np.empty(n, dtype=np.int64)
+        elif types and types <= {int, float}:
+            column = np.full(n, np.nan)
+            values = [np.nan if value is None else value for value in values]
+        else:
+            column = np.full(n, np.nan, dtype=object)
+            values = np.array(values + [None], dtype=object)[:-1]
+        column[rows] = values
+        data[key] = column
+    return pd.DataFrame(data, index=index if index is not None else pd.RangeIndex(n))
+
+
 def normalize_column(df, col):
-    print(col)
-    for k, v in pd.json_normalize(df.pop(col), sep="__").add_prefix(f"{col}__").items():
+    """Replace the column `col` of dicts by one flattened column per nested key, named `<col>__<key>`."""
+    values = df.pop(col)
+    for k, v in flatten_records(values, prefix=col, index=df.index).items():
         df[k] = v.values
 
 
 def dataframe_to_dict(events):
+    """
+    Serialize events for posting, column by column (see `columns_to_records`). The geometry of a GeoDataFrame becomes
+    a `location` dict, or None for missing geometries.
+    """
     if isinstance(events, gpd.GeoDataFrame):
-        events["location"] = pd.DataFrame({"longitude": events.geometry.x, "latitude": events.geometry.y}).to_dict(
-            "records"
-        )
-        del events["geometry"]
+        geometry = events.geometry
+        records = columns_to_records(events, [col for col in events.columns if col != geometry.name])
+        longitude, latitude = shapely.get_x(geometry.values).tolist(), shapely.get_y(geometry.values).tolist()
+        for record, missing, x, y in zip(records, geometry.isna().tolist(), longitude, latitude):
+            record["location"] = None if missing else {"longitude": x, "latitude": y}
+        return records
 
     if isinstance(events, pd.DataFrame):
-        events = events.to_dict("records")
+        return columns_to_records(events, events.columns)
     return events
 
 
+def location_to_xy(locations):
+    """
+    Longitudes and latitudes of a column of locations, each either a `{"longitude": ..., "latitude": ...}` dict or a
+    `[longitude, latitude]` list. Missing locations are NaN.
+
+    Returns
+    -------
+    longitude, latitude : np.ndarray[float64]
+    """
+    longitude, latitude = [], []
+    for location in locations:
+        if isinstance(location, dict):
+            longitude.append(location.get("longitude"))
+            latitude.append(location.get("latitude"))
+        elif isinstance(location, (list, tuple)) and len(location) >= 2:
+            longitude.append(location[0])
+            latitude.append(location[1])
+        else:
+            longitude.append(None)
+            latitude.append(None)
+    return np.array(longitude, dtype=np.float64), np.array(latitude, dtype=np.float64)
+
+
 def to_gdf(df):
-    longitude, latitude = (0, 1) if isinstance(df["location"].iat[0], list) else ("longitude", "latitude")
-    return gpd.GeoDataFrame(
-        df,
-        geometry=gpd.points_from_xy(df["location"].str[longitude], df["location"].str[latitude]),
-        crs=4326,
-    )
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(*location_to_xy(df["location"])), crs=4326)
+
+
+def geojson_to_geometry(values):
+    """
+    Convert a column of GeoJSON features or geometries (as dicts) to geometries in bulk.
+    Points are built directly from their coordinates and other geometries are parsed in a single call to
+    `shapely.from_geojson`. Missing values and features without a geometry become missing geometries.
+
+    Parameters
+    ----------
+    values : pd.Series or list[dict]
+
+    Returns
+    -------
+    geometry : gpd.GeoSeries
+        Geometries in EPSG:4326, with the index of `values`
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+
+    points, point_rows, others, other_rows = [], [], [], []
+    for i, value in enumerate(values):
+        geometry = value.get("geometry") if isinstance(value, dict) and value.get("type") == "Feature" else value
+        if not isinstance(geometry, dict):
+            continue
+        coordinates = geometry.get("coordinates")
+        if geometry.get("type") == "Point" and coordinates is not None and len(coordinates) == 2:
+            points.append(coordinates)
+            point_rows.append(i)
+        else:
+            others.append(json.dumps(geometry))
+            other_rows.append(i)
+
+    out = np.full(len(values), None, dtype=object)
+    if points:
+        out[point_rows] = shapely.points(np.array(points, dtype=np.float64))
+    if others:
+        out[other_rows] = shapely.from_geojson(others)
+    # Every element is a shapely geometry or None already, skip the per-element validation of `from_shapely`
+    return gpd.GeoSeries(gpd.array.GeometryArray(out, crs=4326), index=index)
+
+
+def points_within(points, aoi):
+    """
+    Vectorized point-in-polygon test. The points are indexed in an STRtree which each polygon of `aoi` queries, so that
+    only the points within its bounds are tested exactly.
+
+    Parameters
+    ----------
+    points : gpd.GeoSeries or array-like of shapely.Point
+        Points in EPSG:4326, missing points are never within the AOI
+    aoi : shapely.Geometry or gpd.GeoSeries or gpd.GeoDataFrame
+        Area of interest, in EPSG:4326 if it is a shapely geometry
+
+    Returns
+    -------
+    within : np.ndarray[bool]
+        Whether each point intersects the AOI, boundary included
+    """
+    if isinstance(aoi, (gpd.GeoSeries, gpd.GeoDataFrame)):
+        aoi = aoi.to_crs(4326).geometry.values
+    polygons = shapely.get_parts(np.atleast_1d(np.asarray(aoi, dtype=object)))
+
+    points = np.asarray(points, dtype=object)
+    tree = shapely.STRtree(points)
+    within = np.zeros(len(points), dtype=bool)
+    within[tree.query(polygons, predicate="intersects")[1]] = True
+    return within
+
+
+def aoi_bbox(aoi):
+    """The bounds of `aoi` (see `points_within`) as the `west,south,east,north` string EarthRanger expects."""
+    if isinstance(aoi, (gpd.GeoSeries, gpd.GeoDataFrame)):
+        aoi = aoi.to_crs(4326).geometry.values
+    return ",".join(str(v) for v in shapely.total_bounds(aoi))
+
+
+def observations_to_columns(observations, **constants):
+    """
+    Convert one page of observation records into typed columns as soon as it is received.
+    Times are stored as int64 nanoseconds since the epoch (UTC, NaT as the minimum int64) and the location as
+    float64 longitude/latitude. Any other field is kept as an object array.
+
+    Parameters
+    ----------
+    observations : list[dict]
+        Records as returned by the `observations/` endpoint
+    constants
+        Columns with the same value for every record of the page, e.g. `subject_id=...`
+
+    Returns
+    -------
+    columns : dict[str, np.ndarray]
+    """
+    n = len(observations)
+    keys = dict.fromkeys(k for observation in observations for k in observation)
+
+    columns = {}
+    for key in keys:
+        values = [observation.get(key) for observation in observations]
+        if key == "location":
+            locations = [location or {} for location in values]
+            columns["longitude"] = np.array([loc.get("longitude", np.nan) for loc in locations], dtype=np.float64)
+            columns["latitude"] = np.array([loc.get("latitude", np.nan) for loc in locations], dtype=np.float64)
+        elif key in TIME_COLS:
+            columns[key] = pd.DatetimeIndex(parse_time_col(pd.Series(values, dtype=object))).asi8
+        else:
+            columns[key] = np.array(values + [None], dtype=object)[:-1]
+
+    for key, value in constants.items():
+        columns[key] = np.full(n, value, dtype=object)
+    return columns
+
+
+def concat_observation_columns(batches, categorical=()):
+    """
+    Concatenate the batches produced by `observations_to_columns` into a GeoDataFrame in one step.
+    Columns missing from some batches are filled with NaN/NaT/None.
+
+    Parameters
+    ----------
+    batches : list[dict[str, np.ndarray]]
+    categorical : tuple[str], optional
+        Columns to convert to `pd.Categorical`. None by default, as downstream groupbys (e.g. on `source` as the
+        `groupby_col` of `Relocations`) would yield empty groups for unobserved categories.
+
+    Returns
+    -------
+    observations : gpd.GeoDataFrame
+    """
+    batches = [batch for batch in batches if len(next(iter(batch.values()), ()))]
+    if not batches:
+        return gpd.GeoDataFrame()
+
+    sizes = [len(next(iter(batch.values()))) for batch in batches]
+    keys = dict.fromkeys(k for batch in batches for k in batch)
+
+    data = {}
+    for key in keys:
+        if key in TIME_COLS:
+            missing = np.iinfo(np.int64).min
+        elif key in ("longitude", "latitude"):
+            missing = np.nan
+        else:
+            missing = None
+
+        dtype = next(batch[key].dtype for batch in batches if key in batch)
+        values = np.concatenate(
+            [batch[key] if key in batch else np.full(size, missing, dtype=dtype) for batch, size in zip(batches, sizes)]
+        )
+        if key in TIME_COLS:
+            values = pd.Series(values.view("M8[ns]")).dt.tz_localize("UTC")
+        elif key in categorical:
+            values = pd.Categorical(values)
+        elif values.dtype == object:
+            values = pd.Series(values).infer_objects()
+        data[key] = values
+
+    geometry = gpd.points_from_xy(data.get("longitude", np.nan), data.get("latitude", np.nan))
+    if "longitude" in data:
+        # The `location` of the records, rebuilt from the coordinates in the position it had among their fields
+        location = locations_from_xy(data["longitude"], data["latitude"])
+        data = {
+            ("location" if key == "longitude" else key): (location if key == "longitude" else value)
+            for key, value in data.items()
+            if key != "latitude"
+        }
+    return gpd.GeoDataFrame(data, geometry=geometry, crs=4326)
+
+
+def locations_from_xy(longitude, latitude):
+    """
+    EarthRanger `location` dicts from arrays of coordinates, None where both are missing.
+
+    Parameters
+    ----------
+    longitude, latitude : np.ndarray
+
+    Returns
+    -------
+    locations : np.ndarray
+        Object array of `{"longitude": ..., "latitude": ...}` dicts
+    """
+    missing = (np.isnan(longitude) & np.isnan(latitude)).tolist()
+    locations = [
+        None if m else {"longitude": x, "latitude": y}
+        for x, y, m in zip(longitude.tolist(), latitude.tolist(), missing)
+    ]
+    return np.array(locations + [None], dtype=object)[:-1]
+
+
+def parse_time_col(values):
+    """
+    Parse a column of timestamps to UTC datetimes.
+    Values are parsed as ISO-8601 in a single vectorized pass first. Only the values that fail are then parsed one by
+    one with `dateutil`, so that other formats are still accepted.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Series of object dtype
+
+    Returns
+    -------
+    times : pd.Series of datetime64[ns, UTC]
+    """
+    # Offset-aware and naive values are parsed separately: mixed together, pandas would apply the offsets of the
+    # former to the latter instead of treating naive times as UTC.
+    has_offset = values.str.contains(r":\d\d(?:\.\d+)?(?:[zZ]|[+-]\d\d(?::?\d\d)?)$", na=False).astype(bool)
+    times = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    for mask in [has_offset, ~has_offset]:
+        if mask.any():
+            times[mask] = pd.to_datetime(values[mask], format="ISO8601", utc=True, errors="coerce")
+
+    failed = times.isna() & values.notna()
+    if failed.any():
+        times[failed] = values[failed].apply(lambda x: pd.to_datetime(parser.parse(x), utc=True))
+    return times
 
 
 def clean_time_cols(df):
     for col in TIME_COLS:
         if col in df.columns and not pd.api.types.is_datetime64_ns_dtype(df[col]):
-            # convert x is not None to pd.isna(x) is False
-            df[col] = df[col].apply(lambda x: pd.to_datetime(parser.parse(x), utc=True) if not pd.isna(x) else None)
+            df[col] = parse_time_col(df[col].astype(object))
     return df
 
 
+def coalesce_time_ranges(ranges):
+    """
+    Merge the overlapping time ranges of each key into as few ranges as possible.
+
+    Parameters
+    ----------
+    ranges : list[tuple]
+        (key, start, end) tuples of comparable start/end times. `end` may be None for an open-ended range.
+
+    Returns
+    -------
+    coalesced : list[tuple]
+        (key, start, end) of the merged ranges
+    membership : list[int]
+        Index in `coalesced` of the range containing each input range
+    """
+    coalesced, membership = [], [None] * len(ranges)
+    for i in sorted(range(len(ranges)), key=lambda i: (str(ranges[i][0]), ranges[i][1])):
+        key, start, end = ranges[i]
+        if coalesced:
+            last_key, last_start, last_end = coalesced[-1]
+            if last_key == key and (last_end is None or start <= last_end):
+                coalesced[-1] = (key, last_start, None if None in (last_end, end) else max(last_end, end))
+                membership[i] = len(coalesced) - 1
+                continue
+        coalesced.append((key, start, end))
+        membership[i] = len(coalesced) - 1
+    return coalesced, membership
+
+
 def format_iso_time(date_string: str) -> str:
     try:
         return pd.to_datetime(date_string).isoformat()
@@ -60,13 +418,192 @@ def to_hex(val, default="#ff0000"):
     return default
 
 
+def observations_to_records(observations: gpd.GeoDataFrame, source_id_col="source", recorded_at_col="recorded_at"):
+    """
+    Serialize observations into the records expected by the `observations` endpoint, column by column.
+    Columns other than the source, time and geometry are packed into each record's `additional` dict.
+
+    Parameters
+    ----------
+    observations : gpd.GeoDataFrame
+    source_id_col : str
+        The source column in the observation dataframe
+    recorded_at_col : str
+        The observation recorded time column in the dataframe
+
+    Returns
+    -------
+    records : list[dict]
+    """
+    recorded_at = observations[recorded_at_col]
+    if pd.api.types.is_datetime64_any_dtype(recorded_at):
+        if recorded_at.dt.tz is None:
+            recorded_at = recorded_at.dt.tz_localize("UTC")
+        recorded_at = pd.Series(_to_json_values(recorded_at), index=recorded_at.index)
+
+    columns = {
+        "source": observations[source_id_col].astype(str).tolist(),
+        "recorded_at": recorded_at.astype(str).tolist(),
+        "longitude": observations.geometry.x.tolist(),
+        "latitude": observations.geometry.y.tolist(),
+    }
+    extra_cols = observations.columns.difference([source_id_col, recorded_at_col, observations.geometry.name])
+    additional = columns_to_records(observations, extra_cols) if len(extra_cols) else None
+
+    records = [
+        {"source": source, "recorded_at": time, "location": {"longitude": x, "latitude": y}}
+        for source, time, x, y in zip(
+            columns["source"], columns["recorded_at"], columns["longitude"], columns["latitude"]
+        )
+    ]
+    if additional is not None:
+        for record, extra in zip(records, additional):
+            record["additional"] = extra
+    return records
+
+
+def _to_json_values(column: pd.Series) -> list:
+    # Times become ISO-8601 strings and missing values None, converting the whole column at once
+    if pd.api.types.is_datetime64_any_dtype(column):
+        tz = column.dt.tz
+        values = (column.dt.tz_convert("UTC") if tz is not None else column).to_numpy(dtype="M8[us]")
+        strings = np.datetime_as_string(values, unit="us").astype(object)
+        if tz is not None:
+            strings = strings + "+00:00"
+        strings[np.isnat(values)] = None
+        return strings.tolist()
+
+    values = column.tolist()
+    if column.dtype.kind in "fO" or isinstance(column.dtype, pd.CategoricalDtype):
+        for i in np.flatnonzero(pd.isna(column).to_numpy()):
+            values[i] = None
+    return values
+
+
+def columns_to_records(dataframe: pd.DataFrame, columns: typing.List) -> typing.List[dict]:
+    """
+    Rows of `columns` as JSON-serializable dicts. Each column is converted once as a whole (times to ISO-8601
+    strings, missing values to None), and rows are then assembled from the converted columns.
+    """
+    columns = list(columns)
+    return [dict(zip(columns, row)) for row in zip(*(_to_json_values(dataframe[col]) for col in columns))]
+
+
 def pack_columns(dataframe: pd.DataFrame, columns: typing.List):
     """This method would add all extra columns to single column"""
-    metadata_cols = list(set(dataframe.columns).difference(set(columns)))
+    metadata_cols = [col for col in dataframe.columns if col not in set(columns)]
 
     # To prevent additional column from being dropped, name the column metadata (rename it back).
     if metadata_cols:
-        dataframe["metadata"] = dataframe[metadata_cols].to_dict(orient="records")
+        dataframe["metadata"] = columns_to_records(dataframe, metadata_cols)
         dataframe.drop(metadata_cols, inplace=True, axis=1)
         dataframe.rename(columns={"metadata": "additional"}, inplace=True)
     return dataframe
+
+
+class AdaptivePageSize:
+    """
+    A page size tuned from the observed throughput of previous pages, aiming for pages that take about
+    `target_seconds` to download and weigh at most `max_bytes`. Safe to feed from several threads.
+
+    Parameters
+    ----------
+    initial : int
+        Page size used until the first page is observed
+    minimum, maximum : int
+        Bounds of the page size
+    target_seconds : float
+        Targeted download time of a page
+    max_bytes : int
+        Maximum size of a page, estimated from the serialized size of a sample of its records
+    """
+
+    def __init__(self, initial=4000, minimum=100, maximum=20000, target_seconds=2.0, max_bytes=32 * 2**20):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def observe(self, records, seconds):
+        if not records or seconds <= 0:
+            return
+
+        sample = records[:10]
+        record_bytes = len(json.dumps(sample, default=str)) / len(sample)
+        with self._lock:
+            # Average with the current size to smooth out the latency of individual pages
+            size = (self.size + len(records) / seconds * self.target_seconds) / 2
+            self.size = int(np.clip(min(size, self.max_bytes / record_bytes), self.minimum, self.maximum))
+
+
+class MetadataCache:
+    """
+    A thread-safe LRU cache of EarthRanger GET responses whose entries expire after `ttl` seconds.
+    Only responses from `METADATA_PATHS` are cached. Responses are deep-copied on the way in and out so that callers
+    can't alter cached values.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of responses kept
+    ttl : float
+        Seconds after which a response is fetched again
+    """
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_cacheable(path):
+        path = path.strip("/")
+        return path in METADATA_PATHS or path.startswith(METADATA_PATH_PREFIXES)
+
+    @staticmethod
+    def make_key(path, **kwargs):
+        def freeze(value):
+            if isinstance(value, dict):
+                return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+            if isinstance(value, (list, tuple, set)):
+                return tuple(freeze(v) for v in value)
+            return value
+
+        return path.strip("/"), freeze(kwargs)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path=None):
+        """
+        Drop the cached responses of `path`, or of every path if None.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == path.strip("/")]:
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
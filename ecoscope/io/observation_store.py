@@ -0,0 +1,200 @@
+import datetime
+import json
+import os
+
+import geopandas as gpd
+import pandas as pd
+
+import ecoscope
+
+
+def _to_utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize("UTC") if timestamp.tz is None else timestamp.tz_convert("UTC")
+
+
+class ObservationStore:
+    """
+    A local GeoParquet copy of EarthRanger subject observations that is kept up to date incrementally.
+
+    Observations are partitioned by subject as `<path>/subject_id=<id>/part-<n>.parquet`, one part per sync that found
+    new data. A state file records each subject's high-water marks (latest `created_at` and `recorded_at` stored), so
+    that subsequent syncs only request observations created in EarthRanger since then. Observations are deduplicated
+    on their `id`.
+
+    Parameters
+    ----------
+    er_io : ecoscope.io.EarthRangerIO
+        Client used to fetch observations
+    path : str or PathLike
+        Root directory of the store
+    """
+
+    STATE_FILE = "_sync_state.json"
+
+    def __init__(self, er_io, path):
+        self.er_io = er_io
+        self.path = os.fspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self.state = self._read_state()
+
+    def _read_state(self):
+        try:
+            with open(os.path.join(self.path, self.STATE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_state(self):
+        state_path = os.path.join(self.path, self.STATE_FILE)
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(state_path + ".tmp", state_path)
+
+    def _subject_dir(self, subject_id):
+        return os.path.join(self.path, f"subject_id={subject_id}")
+
+    def _part_paths(self, subject_id):
+        subject_dir = self._subject_dir(subject_id)
+        if not os.path.isdir(subject_dir):
+            return []
+        return sorted(os.path.join(subject_dir, f) for f in os.listdir(subject_dir) if f.endswith(".parquet"))
+
+    def _stored_ids(self, subject_id):
+        paths = self._part_paths(subject_id)
+        if not paths:
+            return pd.Index([])
+        return pd.Index(pd.concat([pd.read_parquet(p, columns=["id"])["id"] for p in paths]))
+
+    def _write_part(self, subject_id, gdf):
+        subject_dir = self._subject_dir(subject_id)
+        os.makedirs(subject_dir, exist_ok=True)
+        gdf.to_parquet(os.path.join(subject_dir, f"part-{len(self._part_paths(subject_id)):05d}.parquet"), index=False)
+
+    def sync(self, subject_ids, since=None, **kwargs):
+        """
+        Fetch the observations of `subject_ids` that aren't in the store yet and append them to it.
+        Parameters
+        ----------
+        subject_ids : str or list[str]
+            List of subject UUIDs
+        since : str, optional
+            Earliest `recorded_at` to keep. Only applied to observations fetched by this call.
+        kwargs
+            Additional arguments to pass in the request to EarthRanger. See the docstring of
+            `EarthRangerIO._get_observations` for info.
+        Returns
+        -------
+        counts : dict
+            Number of new observations stored per subject
+        """
+
+        if isinstance(subject_ids, str):
+            subject_ids = [subject_ids]
+
+        # Subjects sharing a high-water mark can be fetched with a single query
+        groups = {}
+        for subject_id in subject_ids:
+            groups.setdefault(self.state.get(subject_id, {}).get("created_at"), []).append(subject_id)
+
+        counts = dict.fromkeys(subject_ids, 0)
+        for created_after, ids in groups.items():
+            observations = self.er_io.get_subject_observations(
+                ids, relocations=False, since=since, created_after=created_after, **kwargs
+            )
+            if observations.empty:
+                continue
+
+            observations = observations.drop(columns="location", errors="ignore")
+            for subject_id, gdf in observations.groupby("subject_id"):
+                gdf = gdf.drop_duplicates("id")
+                gdf = gdf[~gdf["id"].isin(self._stored_ids(subject_id))]
+                if gdf.empty:
+                    continue
+
+                self._write_part(subject_id, gdf.drop(columns="subject_id"))
+                counts[subject_id] = len(gdf)
+
+                previous = self.state.get(subject_id, {})
+                marks = {}
+                for col in ["created_at", "recorded_at"]:
+                    mark = gdf[col].max()
+                    if col in previous:
+                        mark = max(mark, pd.Timestamp(previous[col]))
+                    marks[col] = mark.tz_convert("UTC").isoformat()
+                self.state[subject_id] = marks
+                self.state[subject_id]["synced_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                self._write_state()
+
+        return counts
+
+    def load(self, subject_ids=None, since=None, until=None, tz="UTC"):
+        """
+        Read observations from the store.
+        Parameters
+        ----------
+        subject_ids : str or list[str], optional
+            List of subject UUIDs. Defaults to every subject in the store.
+        since : str or pd.Timestamp, optional
+            Earliest `recorded_at` to return
+        until : str or pd.Timestamp, optional
+            Latest `recorded_at` to return
+        tz : str, optional
+            Timezone of the returned time columns
+        Returns
+        -------
+        relocations : ecoscope.base.Relocations
+        """
+
+        if subject_ids is None:
+            subject_ids = sorted(self.state)
+        elif isinstance(subject_ids, str):
+            subject_ids = [subject_ids]
+
+        frames = [
+            gpd.read_parquet(p).assign(subject_id=subject_id)
+            for subject_id in subject_ids
+            for p in self._part_paths(subject_id)
+        ]
+        if not frames:
+            return gpd.GeoDataFrame()
+
+        observations = pd.concat(frames, ignore_index=True)
+        if since is not None:
+            observations = observations[observations["recorded_at"] >= _to_utc(since)]
+        if until is not None:
+            observations = observations[observations["recorded_at"] <= _to_utc(until)]
+
+        observations["created_at"] = observations["created_at"].dt.tz_convert(tz)
+        observations["recorded_at"] = observations["recorded_at"].dt.tz_convert(tz)
+        observations = observations.sort_values("recorded_at")
+
+        return ecoscope.base.Relocations.from_gdf(
+            observations,
+            groupby_col="subject_id",
+            uuid_col="id",
+            time_col="recorded_at",
+        )
+
+    def get_subject_observations(self, subject_ids, since=None, until=None, tz="UTC", **kwargs):
+        """
+        Sync `subject_ids` with EarthRanger, then load their observations from the store.
+        Parameters
+        ----------
+        subject_ids : str or list[str]
+            List of subject UUIDs
+        since : str, optional
+            Earliest `recorded_at` to fetch and return
+        until : str, optional
+            Latest `recorded_at` to return
+        tz : str, optional
+            Timezone of the returned time columns
+        kwargs
+            Additional arguments to pass in the request to EarthRanger
+        Returns
+        -------
+        relocations : ecoscope.base.Relocations
+        """
+
+        self.sync(subject_ids, since=since, **kwargs)
+        return self.load(subject_ids, since=since, until=until, tz=tz)
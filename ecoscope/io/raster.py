@@ -8,7 +8,9 @@ import numpy as np
 import pandas as pd
 import pyproj
 import rasterio as rio
+import rasterio.features
 import rasterio.mask
+import shapely
 import tqdm.auto as tqdm
 
 import ecoscope
@@ -182,7 +184,83 @@ def reduce_region(gdf, raster_path_list, reduce_func):
     return pd.DataFrame(d)
 
 
-def raster_to_gdf(raster_path):
+def shapes_to_geometries(shapes):
+    """
+    Build polygons in bulk from the (geometry, value) pairs yielded by `rasterio.features.shapes`.
+    The ring coordinates of all shapes are concatenated once and handed to the vectorized shapely constructors instead
+    of creating each shapely geometry from its GeoJSON-like dict.
+
+    Parameters
+    ----------
+    shapes : iterable of (dict, value)
+        GeoJSON-like polygons and their pixel values
+
+    Returns
+    -------
+    geometries : np.ndarray of shapely.Polygon
+    values : np.ndarray
+    """
+    coords, ring_sizes, ring_polygons, values = [], [], [], []
+    for i, (geom, value) in enumerate(shapes):
+        for ring in geom["coordinates"]:
+            coords.append(np.asarray(ring, dtype=np.float64))
+            ring_sizes.append(len(ring))
+            ring_polygons.append(i)
+        values.append(value)
+
+    if not values:
+        return np.array([], dtype=object), np.array(values)
+
+    rings = shapely.linearrings(np.concatenate(coords), indices=np.repeat(np.arange(len(ring_sizes)), ring_sizes))
+    return shapely.polygons(rings, indices=np.asarray(ring_polygons)), np.asarray(values)
+
+
+def cells_to_geometries(image, transform, mask=None):
+    """
+    Build one square polygon per valid pixel directly from its row/column indices. This skips the contour tracing of
+    `rasterio.features.shapes` entirely, which makes it the fast option for regular grids where neighbouring pixels
+    don't need to be merged.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        2D array of pixel values
+    transform : affine.Affine
+        Affine transform of the raster
+    mask : np.ndarray, optional
+        2D array where truthy values mark the pixels to keep. NaN pixels are always dropped.
+
+    Returns
+    -------
+    geometries : np.ndarray of shapely.Polygon
+    values : np.ndarray
+    """
+    valid = pd.notna(image)
+    if mask is not None:
+        valid &= mask.astype(bool)
+
+    rows, cols = np.nonzero(valid)
+    x0, y0 = transform * (cols, rows)
+    x1, y1 = transform * (cols + 1, rows + 1)
+    geometries = shapely.box(np.minimum(x0, x1), np.minimum(y0, y1), np.maximum(x0, x1), np.maximum(y0, y1))
+    return geometries, image[rows, cols]
+
+
+def raster_to_gdf(raster_path, as_cells=False):
+    """
+    Convert the first band of a raster into a GeoDataFrame of polygons with a `value` column.
+
+    Parameters
+    ----------
+    raster_path : str or PathLike
+        Path of the raster file
+    as_cells : bool, optional
+        If True, emit one polygon per valid pixel instead of merging neighbouring pixels with the same value
+
+    Returns
+    -------
+    gdf : geopandas.GeoDataFrame
+    """
     with rio.open(raster_path) as src:
         image = src.read(1)
 
@@ -198,14 +276,14 @@ def raster_to_gdf(raster_path):
             image = image.astype(dtype)
 
         mask = src.dataset_mask()
-        return gpd.GeoDataFrame.from_features(
-            [
-                {"properties": {"value": value}, "geometry": polygon}
-                for polygon, value in rio.features.shapes(image, transform=src.transform, mask=mask)
-                if pd.notna(value)
-            ],
-            crs=src.crs,
-        )
+        if as_cells:
+            geometries, values = cells_to_geometries(image, src.transform, mask=mask)
+        else:
+            geometries, values = shapes_to_geometries(rio.features.shapes(image, transform=src.transform, mask=mask))
+            keep = pd.notna(values)
+            geometries, values = geometries[keep], values[keep]
+
+        return gpd.GeoDataFrame({"value": values}, geometry=geometries, crs=src.crs)[["geometry", "value"]]
 
 
 def grid_to_raster(grid=None, val_column="", out_dir="", raster_name=None, xlen=5000, ylen=5000):
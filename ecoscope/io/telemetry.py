@@ -0,0 +1,145 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("bytes", "pages", "rows", "retries")
+
+# Duration of the last HTTP exchange of the current thread or task, so that the time a client spends on a response
+# afterwards (mostly JSON decoding) can be told apart from the time spent on the network
+_request_seconds = contextvars.ContextVar("request_seconds", default=0.0)
+
+
+class Telemetry:
+    """
+    Opt-in instrumentation of the downloads of `EarthRangerIO` and `AsyncEarthRangerIO`.
+
+    Every measurement is an event: a dict with the `stage` it belongs to, its duration in `seconds`, and any of the
+    counters `bytes`, `pages`, `rows` and `retries`. Events are passed to `callback`, logged to the
+    `ecoscope.io.telemetry` logger at `log_level` (with the event as `extra`), and totalled by stage for `summary`.
+
+    The stages recorded are:
+
+    - request: HTTP exchanges, until their body is received. `bytes` of the (decompressed) body and `retries` of the
+      connection pool.
+    - decode: time spent by the client on a response once it's received, mostly JSON decoding
+    - page: pages downloaded by the page scheduler, from request to decoded records. `pages`, `rows` and the
+      `retries` of failed pages.
+    - parse: conversion of pages of records to columns
+    - to_gdf: assembly of the GeoDataFrame, including time and geometry columns
+    - clean_time_cols: parsing of the time columns of events and other objects
+    - filter: filtering of observations to an area of interest
+    - merge_details: merge of source, subject and subjectsource details
+    - relocations: `Relocations.from_gdf`
+
+    Events of the `request`, `decode` and `page` stages are emitted by the threads or the event loop downloading
+    pages, so `callback` must be thread-safe.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with each event
+    log_level : int, optional
+        Level of the log record of each event
+    """
+
+    def __init__(self, callback=None, log_level=logging.DEBUG):
+        self.callback = callback
+        self.log_level = log_level
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the totals of every stage."""
+        with self._lock:
+            self._totals = {}
+
+    def record(self, stage, seconds=0.0, **counters):
+        """Record an event of `stage` lasting `seconds`, with the given counters."""
+        event = {"stage": stage, "seconds": seconds, **counters}
+        with self._lock:
+            totals = self._totals.setdefault(stage, dict.fromkeys(("calls", "seconds") + COUNTERS, 0))
+            totals["calls"] += 1
+            for key in ("seconds",) + COUNTERS:
+                totals[key] += event.get(key, 0)
+        if logger.isEnabledFor(self.log_level):
+            logger.log(self.log_level, "%s", event, extra={"telemetry": event})
+        if self.callback is not None:
+            self.callback(event)
+
+    @contextlib.contextmanager
+    def stage(self, name, **counters):
+        """
+        Time the body of a `with` block as an event of stage `name`. The block can add counters to the dict it gets.
+        """
+        counters = dict(counters)
+        start = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.record(name, time.perf_counter() - start, **counters)
+
+    def summary(self):
+        """
+        Totals of each stage, in the order stages were first recorded. The `seconds` of stages running concurrently
+        (`request`, `decode` and `page`) add up over threads, so they can exceed the elapsed time.
+        Returns
+        -------
+        summary : pd.DataFrame
+            `calls`, `seconds`, `bytes`, `pages`, `rows` and `retries` of each stage, indexed by stage
+        """
+        with self._lock:
+            totals = {stage: dict(values) for stage, values in self._totals.items()}
+        summary = pd.DataFrame.from_dict(totals, orient="index", columns=["calls", "seconds", *COUNTERS])
+        return summary.astype({column: "int64" for column in ("calls", *COUNTERS)}).rename_axis("stage")
+
+
+def measure(telemetry, name, **counters):
+    """`telemetry.stage(name, **counters)`, or a context manager doing nothing if `telemetry` is None."""
+    if telemetry is None:
+        return contextlib.nullcontext(counters)
+    return telemetry.stage(name, **counters)
+
+
+def record_response(telemetry, response, stream=False, **kwargs):
+    """
+    Response hook of a `requests.Session` recording each response as a `request` event of `telemetry`.
+    The body of non-streamed responses is read here so that its download is part of the event.
+    """
+    start = time.perf_counter()
+    if stream:
+        size = int(response.headers.get("content-length") or 0)
+    else:
+        size = len(response.content)
+    seconds = response.elapsed.total_seconds() + time.perf_counter() - start
+    retries = getattr(response.raw, "retries", None)
+    _request_seconds.set(seconds)
+    telemetry.record("request", seconds, bytes=size, retries=len(retries.history) if retries else 0)
+
+
+async def record_async_response(telemetry, response):
+    """Response event hook of an `httpx.AsyncClient`, like `record_response`."""
+    await response.aread()
+    # Unlike with `requests`, the elapsed time of an httpx response lasts until its body is received
+    seconds = response.elapsed.total_seconds()
+    _request_seconds.set(seconds)
+    telemetry.record("request", seconds, bytes=len(response.content))
+
+
+@contextlib.contextmanager
+def measure_decode(telemetry):
+    """
+    Record the time spent in the body of a `with` block, minus the HTTP exchange it makes, as a `decode` event.
+    """
+    if telemetry is None:
+        yield
+        return
+    _request_seconds.set(0.0)
+    start = time.perf_counter()
+    yield
+    telemetry.record("decode", max(time.perf_counter() - start - _request_seconds.get(), 0.0))
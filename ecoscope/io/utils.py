@@ -1,6 +1,9 @@
+import asyncio
 import email
+import functools
 import os
 import re
+import threading
 import zipfile
 
 import requests
@@ -9,40 +12,132 @@ from tqdm.auto import tqdm
 from urllib3.util import Retry
 
 
-def download_file(url, path, retries=2, overwrite_existing=False, chunk_size=1024, unzip=False, **request_kwargs):
+class PooledSession(requests.Session):
+    """
+    A `requests.Session` keeping up to `pool_size` connections alive per host, so that concurrent requests reuse
+    connections instead of opening new ones.
+
+    Connection errors are retried for every method, and reads and `status_forcelist` responses only for idempotent
+    methods. Once retries are exhausted, the last response is returned rather than raised so that callers can
+    handle it.
+
+    Parameters
+    ----------
+    pool_size : int
+        Number of connections kept alive per host. Match it to the number of threads sharing the session.
+    retries : int
+        Number of retries of a request
+    backoff_factor : float
+        Factor of the exponential backoff between retries, in seconds
+    status_forcelist : tuple[int]
+        Response statuses to retry
+    gzip : bool
+        Whether to ask for gzip-compressed responses
+    """
+
+    def __init__(self, pool_size=10, retries=2, backoff_factor=0.1, status_forcelist=(500, 502, 503, 504), gzip=True):
+        super().__init__()
+        max_retries = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["Connection"] = "keep-alive"
+        self.headers["Accept-Encoding"] = "gzip, deflate" if gzip else "identity"
+
+    def connection_stats(self):
+        """
+        Number of requests sent and connections opened by the connection pools currently alive.
+        Returns
+        -------
+        stats : dict
+            `requests`, `connections` and `reused`, the number of requests that reused a connection
+        """
+        n_requests = n_connections = 0
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    n_requests += pool.num_requests
+                    n_connections += pool.num_connections
+        return {"requests": n_requests, "connections": n_connections, "reused": max(n_requests - n_connections, 0)}
+
+
+class BackgroundEventLoop:
+    """
+    An asyncio event loop running in a daemon thread, so that synchronous code (scripts, notebooks that already run
+    their own loop...) can run coroutines on it and wait for their results.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="ecoscope-event-loop", daemon=True)
+        self._thread.start()
+
+    def submit(self, coroutine):
+        """Schedule `coroutine` on the loop, returning a `concurrent.futures.Future` of its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        """Run `coroutine` on the loop and wait for its result."""
+        return self.submit(coroutine).result()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_session(retries=2):
+    """The `PooledSession` shared by downloads that don't pass their own session."""
+    return PooledSession(retries=retries)
+
+
+def download_file(
+    url, path, retries=2, overwrite_existing=False, chunk_size=1024, unzip=False, session=None, **request_kwargs
+):
     """
     Download a file from a URL to a local path. If the path is a directory, the filename will be inferred from
-    the response header
+    the response header.
+    The download goes through `session` if given (e.g. `EarthRangerIO.session`), or through a session shared by
+    all downloads, so that connections are reused.
     """
 
-    s = requests.Session()
-    retries = Retry(total=retries, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-    s.mount("https://", HTTPAdapter(max_retries=retries))
+    s = session if session is not None else shared_session(retries)
 
     if __is_gdrive_url(url):
         url = __transform_gdrive_url(url)
     elif __is_dropbox_url(url):
         url = __transform_dropbox_url(url)
 
-    r = s.get(url, stream=True, **request_kwargs)
-
-    if os.path.isdir(path):
-        m = email.message.Message()
-        m["content-type"] = r.headers.get("content-disposition")
-        filename = m.get_param("filename")
-        if filename is None:
-            raise ValueError("URL has no RFC 6266 filename.")
-        path = os.path.join(path, filename)
-
-    if os.path.exists(path) and not overwrite_existing:
-        print(f"{path} exists. Skipping...")
-        return
-
-    with open(path, "wb") as f:
-        content_length = r.headers.get("content-length")
-        with tqdm.wrapattr(f, "write", total=int(content_length)) if content_length else f as fout:
-            for chunk in r.iter_content(chunk_size=chunk_size):
-                fout.write(chunk)
+    # Closing the response hands its connection back to the pool
+    with s.get(url, stream=True, **request_kwargs) as r:
+        r.raise_for_status()
+        if os.path.isdir(path):
+            m = email.message.Message()
+            m["content-type"] = r.headers.get("content-disposition")
+            filename = m.get_param("filename")
+            if filename is None:
+                raise ValueError("URL has no RFC 6266 filename.")
+            path = os.path.join(path, filename)
+
+        if os.path.exists(path) and not overwrite_existing:
+            print(f"{path} exists. Skipping...")
+            return
+
+        with open(path, "wb") as f:
+            content_length = r.headers.get("content-length")
+            with tqdm.wrapattr(f, "write", total=int(content_length)) if content_length else f as fout:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    fout.write(chunk)
 
     # Check if the file is a zip file
     if zipfile.is_zipfile(path) and unzip:
@@ -1,4 +1,6 @@
-from ecoscope.mapping.map import EcoMap
+from ecoscope._lazy import attach
+
+__getattr__, __dir__ = attach(__name__, submodules=["map"], attributes={"EcoMap": "map"})
 
 __all__ = [
     "EcoMap",
@@ -1,13 +1,19 @@
-from ecoscope.plotting.plot import (
-    EcoPlotData,
-    add_seasons,
-    ecoplot,
-    mcp,
-    nsd,
-    plot_seasonal_dist,
-    speed,
-    stacked_bar_chart,
-    pie_chart,
+from ecoscope._lazy import attach
+
+__getattr__, __dir__ = attach(
+    __name__,
+    submodules=["plot"],
+    attributes={
+        "EcoPlotData": "plot",
+        "add_seasons": "plot",
+        "ecoplot": "plot",
+        "mcp": "plot",
+        "nsd": "plot",
+        "plot_seasonal_dist": "plot",
+        "speed": "plot",
+        "stacked_bar_chart": "plot",
+        "pie_chart": "plot",
+    },
 )
 
 __all__ = [
@@ -8,6 +8,7 @@ import pytest
 
 import ecoscope
 from ecoscope.base import Relocations
+from tests.mock_er_server import MockERServer, make_observations
 
 os.environ["USE_PYGEOS"] = "0"
 
@@ -66,6 +67,25 @@ def er_events_io():
     return er_events_io
 
 
+@pytest.fixture
+def mock_er_server():
+    observations = {f"subject-{i}": make_observations(f"subject-{i}", n) for i, n in enumerate([0, 1, 25, 40, 7, 60])}
+    with MockERServer(observations=observations, latency=0.01) as server:
+        yield server
+
+
+@pytest.fixture
+def mock_er_io(mock_er_server):
+    return ecoscope.io.EarthRangerIO(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        tcp_limit=4,
+        sub_page_size=10,
+    )
+
+
 @pytest.fixture
 def movebank_relocations():
     df = pd.read_feather("tests/sample_data/vector/movebank_data.feather")
@@ -0,0 +1,369 @@
+"""
+A minimal in-process EarthRanger server for exercising `EarthRangerIO` and `AsyncEarthRangerIO` without network access.
+
+It serves the token and `user/me` endpoints needed to build a client, and paginated `observations/`, `activity/events`,
+`activity/patrols`, `subjects/` and `subjectgroups/`. Payloads are either passed in, generated deterministically (see
+`MockERServer.synthetic`) or replayed from a recording saved with `MockERServer.save`. Posted observations are
+collected in `posted`; setting `fail_posts` makes that many posts fail with a 500 first. Page requests for the
+observations of the subjects in `fail_subjects` are denied with a 403.
+
+It doubles as a fixture for the IO benchmarks, see `benchmarks/bench_earthranger_io.py`.
+"""
+
+import datetime
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_ROOT = "/api/v1.0/"
+DEFAULT_PAGE_SIZE = 100
+
+
+def make_observations(subject_id, n, start="2023-01-01T00:00:00+00:00"):
+    start = datetime.datetime.fromisoformat(start)
+    source = str(uuid.uuid5(uuid.NAMESPACE_URL, f"source/{subject_id}"))
+    return [
+        {
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"observation/{subject_id}/{i}")),
+            "location": {"longitude": 36.0 + i * 1e-3, "latitude": 0.5 - i * 1e-3},
+            "recorded_at": (start + datetime.timedelta(hours=i)).isoformat(),
+            "created_at": (start + datetime.timedelta(hours=i, minutes=5)).isoformat(),
+            "exclusion_flags": 0,
+            "source": source,
+        }
+        for i in range(n)
+    ]
+
+
+def make_event(serial_number, time, location=True, event_type="wildlife_sighting_rep"):
+    time = datetime.datetime.fromisoformat(time)
+    longitude, latitude = 36.0 + (serial_number % 100) * 1e-3, 0.5 - (serial_number % 50) * 1e-3
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"event/{serial_number}")),
+        "serial_number": serial_number,
+        "event_type": event_type,
+        "priority": 0,
+        "state": "new",
+        "title": None,
+        "time": time.isoformat(),
+        "created_at": (time + datetime.timedelta(minutes=5)).isoformat(),
+        "updated_at": (time + datetime.timedelta(minutes=10)).isoformat(),
+        "location": {"longitude": longitude, "latitude": latitude} if location else None,
+        "geojson": {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+            "properties": {"datetime": time.isoformat()},
+        }
+        if location
+        else None,
+        "event_details": {"species": "elephant", "count": serial_number % 7},
+    }
+
+
+def make_subject(subject_id, last_position_date=None):
+    return {
+        "id": subject_id,
+        "name": f"Subject {subject_id}",
+        "subject_type": "wildlife",
+        "subject_subtype": "elephant",
+        "is_active": True,
+        "additional": {"rgb": "255,0,0"},
+        "created_at": "2022-01-01T00:00:00+00:00",
+        "updated_at": "2022-01-01T00:00:00+00:00",
+        "last_position_date": last_position_date,
+        "tracks_available": last_position_date is not None,
+    }
+
+
+def make_patrol(serial_number, subject_id, start_time, end_time):
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"patrol/{serial_number}")),
+        "serial_number": serial_number,
+        "title": f"Patrol {serial_number}",
+        "patrol_segments": [
+            {
+                "leader": {"id": subject_id},
+                "patrol_type": "routine_patrol",
+                "time_range": {"start_time": start_time, "end_time": end_time},
+            }
+        ],
+    }
+
+
+class MockERServer:
+    """
+    Parameters
+    ----------
+    observations : dict
+        Mapping of subject id to the list of observations served for it
+    patrols : list[dict]
+        Patrols served by `activity/patrols`
+    events : list[dict]
+        Events served by `activity/events`
+    subjects : list[dict]
+        Subjects served by `subjects/`. Defaults to one subject per key of `observations`.
+    subjectgroups : dict
+        Mapping of subject group name to the ids of its subjects
+    latency : float
+        Seconds to sleep before answering every API request
+    max_page_size : int, optional
+        Largest page the server returns, whatever `page_size` is requested
+    """
+
+    def __init__(
+        self,
+        observations=None,
+        patrols=None,
+        events=None,
+        subjects=None,
+        subjectgroups=None,
+        latency=0.0,
+        max_page_size=None,
+    ):
+        self.observations = observations or {}
+        self.patrols = patrols or []
+        self.events = events or []
+        self.subjects = (
+            subjects
+            if subjects is not None
+            else [make_subject(s, o[-1]["recorded_at"] if o else None) for s, o in self.observations.items()]
+        )
+        self.subjectgroups = subjectgroups or {}
+        self.max_page_size = max_page_size
+        self.patrol_types = [
+            {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, "patrol_type/routine_patrol")),
+                "value": "routine_patrol",
+                "display": "Routine Patrol",
+                "ordernum": 1,
+                "icon_id": "routine-patrol-icon",
+                "default_priority": 0,
+                "is_active": True,
+            }
+        ]
+        self.latency = latency
+        self.requests = []
+        self.posted = []
+        self.fail_posts = 0
+        self.fail_subjects = set()
+        self.max_concurrency = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def synthetic(
+        cls,
+        subjects=10,
+        observations_per_subject=1000,
+        events=0,
+        patrols=0,
+        start="2023-01-01T00:00:00+00:00",
+        **kwargs,
+    ):
+        """
+        A server with generated payloads: `subjects` subjects (in the group "all") with `observations_per_subject`
+        hourly observations each, `events` hourly events (every tenth without a location) and `patrols` patrols,
+        each following a subject for a day.
+        """
+        subject_ids = [f"subject-{i}" for i in range(subjects)]
+        start_time = datetime.datetime.fromisoformat(start)
+        return cls(
+            observations={s: make_observations(s, observations_per_subject, start) for s in subject_ids},
+            events=[
+                make_event(i, (start_time + datetime.timedelta(hours=i)).isoformat(), location=i % 10 != 0)
+                for i in range(events)
+            ],
+            patrols=[
+                make_patrol(
+                    i,
+                    subject_ids[i % subjects],
+                    (start_time + datetime.timedelta(days=i)).isoformat(),
+                    (start_time + datetime.timedelta(days=i + 1)).isoformat(),
+                )
+                for i in range(patrols)
+            ],
+            subjectgroups={"all": subject_ids},
+            **kwargs,
+        )
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """A server replaying the payloads recorded in the JSON file at `path` by `save`."""
+        with open(path) as f:
+            recording = json.load(f)
+        return cls(**recording, **kwargs)
+
+    def save(self, path):
+        """Record the payloads served to a JSON file, to be replayed with `load`."""
+        recording = {
+            "observations": self.observations,
+            "patrols": self.patrols,
+            "events": self.events,
+            "subjects": self.subjects,
+            "subjectgroups": self.subjectgroups,
+        }
+        with open(path, "w") as f:
+            json.dump(recording, f)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def get_observations(self, params):
+        if "source_id" in params:
+            observations = [
+                o for subject in self.observations.values() for o in subject if o["source"] == params["source_id"]
+            ]
+        else:
+            observations = self.observations.get(params.get("subject_id"), [])
+        if "since" in params:
+            since = datetime.datetime.fromisoformat(params["since"])
+            observations = [o for o in observations if datetime.datetime.fromisoformat(o["recorded_at"]) >= since]
+        if "until" in params:
+            until = datetime.datetime.fromisoformat(params["until"])
+            observations = [o for o in observations if datetime.datetime.fromisoformat(o["recorded_at"]) <= until]
+        if "created_after" in params:
+            created_after = datetime.datetime.fromisoformat(params["created_after"])
+            observations = [
+                o for o in observations if datetime.datetime.fromisoformat(o["created_at"]) >= created_after
+            ]
+        return observations
+
+    def get_events(self, params):
+        events = self.events
+        date_range = json.loads(params.get("filter") or "{}").get("date_range", {})
+        if "lower" in date_range:
+            lower = datetime.datetime.fromisoformat(date_range["lower"])
+            events = [e for e in events if datetime.datetime.fromisoformat(e["time"]) >= lower]
+        if "upper" in date_range:
+            upper = datetime.datetime.fromisoformat(date_range["upper"])
+            events = [e for e in events if datetime.datetime.fromisoformat(e["time"]) <= upper]
+        return events
+
+    def get_subjects(self, params):
+        subjects = self.subjects
+        if "subject_group" in params:
+            members = set(self.subjectgroups.get(params["subject_group"], []))
+            subjects = [s for s in subjects if s["id"] in members]
+        if "id" in params:
+            ids = set(params["id"].split(","))
+            subjects = [s for s in subjects if s["id"] in ids]
+        if "bbox" in params:
+            west, south, east, north = map(float, params["bbox"].split(","))
+            subjects = [
+                s
+                for s in subjects
+                if any(
+                    west <= o["location"]["longitude"] <= east and south <= o["location"]["latitude"] <= north
+                    for o in self.observations.get(s["id"], [])
+                )
+            ]
+        return subjects
+
+    def handle(self, method, path, params, body=None):
+        if path == "/oauth2/token":
+            return 200, {"access_token": "mock", "token_type": "Bearer", "expires_in": 36000}
+        if not path.startswith(API_ROOT):
+            return 404, {"status": {"detail": "not found"}}
+
+        endpoint = path[len(API_ROOT) :].strip("/")
+        if method == "POST" and endpoint == "observations":
+            with self._lock:
+                if self.fail_posts:
+                    self.fail_posts -= 1
+                    return 500, {"status": {"detail": "internal error"}}
+                self.posted.extend(body)
+            return 201, {"data": body}
+        if endpoint == "user/me":
+            return 200, {"data": {"username": "mock"}}
+        if endpoint == "observations":
+            if params.get("subject_id") in self.fail_subjects and params.get("page_size") != "1":
+                return 403, {"status": {"detail": "permission denied"}}
+            return 200, {"data": self.paginate(self.get_observations(params), path, params)}
+        if endpoint == "activity/patrols/types":
+            return 200, {"data": self.patrol_types}
+        if endpoint == "activity/patrols":
+            return 200, {"data": self.paginate(self.patrols, path, params)}
+        if endpoint == "activity/events":
+            return 200, {"data": self.paginate(self.get_events(params), path, params)}
+        if endpoint == "subjects":
+            return 200, {"data": self.paginate(self.get_subjects(params), path, params)}
+        if endpoint == "subjectgroups":
+            # Subject groups are identified by their name
+            names = [n for n in self.subjectgroups if params.get("group_name") in (None, n)]
+            return 200, {"data": [{"id": n, "name": n, "subjects": []} for n in names]}
+        return 404, {"status": {"detail": "not found"}}
+
+    def paginate(self, items, path, params):
+        page = int(params.get("page", 1))
+        page_size = int(params.get("page_size", DEFAULT_PAGE_SIZE))
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        next_url = None
+        if page * page_size < len(items):
+            next_url = f"{self.url}{path}?{urlencode({**params, 'page': page + 1})}"
+        return {"count": len(items), "next": next_url, "results": items[(page - 1) * page_size : page * page_size]}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive between requests, like a production server
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, method, body=None):
+                parsed = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                with server._lock:
+                    server.requests.append((method, parsed.path, params))
+                    server._active += 1
+                    server.max_concurrency = max(server.max_concurrency, server._active)
+                try:
+                    if server.latency and parsed.path.startswith(API_ROOT):
+                        time.sleep(server.latency)
+                    status, body = server.handle(method, parsed.path, params, body)
+                finally:
+                    with server._lock:
+                        server._active -= 1
+
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type") == "application/json":
+                    body = json.loads(body)
+                self._respond("POST", body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
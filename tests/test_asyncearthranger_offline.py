@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+import ecoscope
+from tests.mock_er_server import make_event, make_patrol
+
+
+@pytest_asyncio.fixture
+async def mock_er_io_async(mock_er_server):
+    er_io = await ecoscope.io.AsyncEarthRangerIO.create(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        tcp_limit=2,
+        sub_page_size=10,
+    )
+    yield er_io
+    await er_io.close()
+
+
+@pytest.mark.asyncio
+async def test_get_observation_batches(mock_er_io_async, mock_er_server):
+    subject_ids = list(mock_er_server.observations)
+    batches = [batch async for batch in mock_er_io_async.get_observation_batches(subject_ids=subject_ids)]
+
+    assert all(0 < len(batch) <= 10 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 133
+    assert str(batches[0]["recorded_at"].dtype) == "datetime64[ns, UTC]"
+    assert 1 < mock_er_server.max_concurrency <= 2
+
+
+@pytest.mark.asyncio
+async def test_get_observation_batches_stop_early(mock_er_io_async, mock_er_server):
+    batches = mock_er_io_async.get_observation_batches(subject_ids=list(mock_er_server.observations))
+    assert len(await batches.__anext__()) > 0
+    # give the downloads time to fill the queue
+    await asyncio.sleep(0.2)
+    await asyncio.wait_for(batches.aclose(), timeout=5)
+
+    # the producer and its downloads are done, not blocked on the full queue
+    await asyncio.sleep(0.05)
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+@pytest.mark.asyncio
+async def test_get_relocations(mock_er_io_async, mock_er_server):
+    relocations = await mock_er_io_async.get_relocations(subject_ids=["subject-3", "subject-5", "subject-0"])
+
+    assert isinstance(relocations, ecoscope.base.Relocations)
+    assert relocations.groupby("groupby_col").size().to_dict() == {"subject-3": 40, "subject-5": 60}
+    assert relocations["fixtime"].is_monotonic_increasing
+
+
+@pytest.mark.asyncio
+async def test_get_observations_gdf(mock_er_io_async):
+    observations = await mock_er_io_async.get_observations_gdf(subject_ids="subject-2")
+    assert len(observations) == 25
+
+
+@pytest.mark.asyncio
+async def test_get_patrol_observations_bounded(mock_er_io_async, mock_er_server):
+    mock_er_server.patrols = [
+        make_patrol(i, f"subject-{i % 6}", "2023-01-01T00:00:00+00:00", "2023-01-01T12:00:00+00:00") for i in range(20)
+    ]
+    mock_er_io_async.request_latencies.clear()
+
+    relocations = await mock_er_io_async.get_patrol_observations_with_patrol_filter()
+
+    assert isinstance(relocations, ecoscope.base.Relocations)
+    # observations within the first 12 hours of the leader, for each patrol: subjects 0 and 1 lead 4 patrols, the
+    # others 3
+    assert len(relocations) == 4 * (0 + 1) + 3 * (13 + 13 + 7 + 13)
+    assert mock_er_server.max_concurrency <= mock_er_io_async.tcp_limit
+
+    stats = mock_er_io_async.get_request_latency_stats()
+    assert stats["count"] >= 20
+    assert 0 < stats["p50"] <= stats["p95"] <= stats["max"]
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache(mock_er_server):
+    er_io = await ecoscope.io.AsyncEarthRangerIO.create(
+        server=mock_er_server.url, username="mock", password="mock", discovery=False, metadata_cache_ttl=300
+    )
+    await er_io.get_patrol_types_dataframe()
+    await er_io.get_patrol_types_dataframe()
+    await er_io.close()
+    assert sum(path.endswith("activity/patrols/types") for _, path, _ in mock_er_server.requests) == 1
+    assert er_io.metadata_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache_off_by_default(mock_er_io_async, mock_er_server):
+    assert mock_er_io_async.metadata_cache is None
+    await mock_er_io_async.get_patrol_types_dataframe()
+    await mock_er_io_async.get_patrol_types_dataframe()
+    assert sum(path.endswith("activity/patrols/types") for _, path, _ in mock_er_server.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_events_dataframe(mock_er_io_async, mock_er_server):
+    mock_er_server.events = [
+        make_event(i, f"2023-01-{i // 24 + 1:02d}T{i % 24:02d}:00:00+00:00", location=i > 0) for i in range(25)
+    ]
+    events = await mock_er_io_async.get_events_dataframe()
+
+    assert len(events) == 25
+    assert events.geometry.isna().sum() == 1
+    assert events.crs == 4326
+
+
+@pytest.mark.asyncio
+async def test_telemetry(mock_er_server):
+    telemetry = ecoscope.io.Telemetry()
+    er_io = await ecoscope.io.AsyncEarthRangerIO.create(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        sub_page_size=10,
+        telemetry=telemetry,
+    )
+    try:
+        relocations = await er_io.get_relocations(subject_ids=["subject-3", "subject-5"])
+    finally:
+        await er_io.close()
+    summary = telemetry.summary()
+
+    assert summary.loc["request", "calls"] == len(mock_er_server.requests)
+    assert summary.loc["request", "bytes"] > 0
+    assert summary.loc["parse", "rows"] == summary.loc["relocations", "rows"] == len(relocations) == 100
@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 import pandas.testing
 import pytest
+import shapely
 
 import ecoscope
 
@@ -84,6 +85,41 @@ def test_displacement_property(movebank_relocations):
     )
 
 
+def test_tortuosity_window(movebank_relocations):
+    trajectory = ecoscope.base.Trajectory.from_relocations(movebank_relocations)
+    tortuosity = trajectory.get_tortuosity(window=3)
+
+    assert tortuosity.index.equals(trajectory.index)
+    assert (tortuosity.dropna() >= 1).all()
+    assert tortuosity.notna().sum() > 0.9 * len(trajectory)
+    # The last two segments of each subject have no complete window
+    assert trajectory.loc[tortuosity.isna()].groupby("groupby_col").size().ge(2).all()
+
+    # the values follow the row order of the trajectory given
+    shuffled = trajectory.sample(frac=1, random_state=0)
+    shuffled_tortuosity = shuffled.get_tortuosity(window=3)
+    assert shuffled_tortuosity.index.equals(shuffled.index)
+    pd.testing.assert_series_equal(shuffled_tortuosity, tortuosity.loc[shuffled.index])
+
+
+@pytest.mark.parametrize("window", [1, 3, 5])
+def test_movement_kernels_engines(movebank_relocations, window):
+    trajectory = ecoscope.base.Trajectory.from_relocations(movebank_relocations)
+    trajectory = trajectory.loc[trajectory["groupby_col"] == "Habiba"].to_crs(trajectory.estimate_utm_crs())
+    coords = shapely.get_coordinates(trajectory.geometry.values).reshape(-1, 2, 2)
+    segments = coords[:, 0, 0], coords[:, 0, 1], coords[:, 1, 0], coords[:, 1, 1]
+    timespan_hours = trajectory["timespan_seconds"].to_numpy() / 3600
+
+    for kernel, args in [
+        (ecoscope.base.step_dot_products, segments),
+        (ecoscope.base.straightness_tortuosity, (*segments, window)),
+        (ecoscope.base.time_beeline_tortuosity, (*segments, timespan_hours, window)),
+    ]:
+        expected = kernel(*args)
+        assert len(expected) == len(trajectory)
+        np.testing.assert_allclose(kernel(*args, engine="numba"), expected, rtol=1e-12)
+
+
 def test_tortuosity(movebank_relocations):
     trajectory = ecoscope.base.Trajectory.from_relocations(movebank_relocations)
     expected = pd.Series(
@@ -0,0 +1,458 @@
+import json
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from erclient.client import ERClientPermissionDenied
+
+import ecoscope
+from tests.mock_er_server import MockERServer, make_event, make_observations, make_patrol, make_subject
+
+
+def test_get_subject_observations_all_subjects(mock_er_io, mock_er_server):
+    subject_ids = list(mock_er_server.observations)
+    relocations = mock_er_io.get_subject_observations(subject_ids)
+
+    assert isinstance(relocations, ecoscope.base.Relocations)
+    expected = pd.Series({s: len(o) for s, o in mock_er_server.observations.items() if o}).sort_index()
+    pd.testing.assert_series_equal(
+        relocations.groupby("groupby_col").size().sort_index(), expected, check_names=False, check_index_type=False
+    )
+    assert relocations.index.is_unique
+    assert relocations["fixtime"].is_monotonic_increasing
+    assert relocations["extra__location"].iloc[0] == {
+        "longitude": relocations.geometry.x.iloc[0],
+        "latitude": relocations.geometry.y.iloc[0],
+    }
+
+
+def test_get_source_observations_single_source_trajectory(mock_er_io, mock_er_server):
+    source_ids = [o[0]["source"] for o in mock_er_server.observations.values() if o]
+    relocations = mock_er_io.get_source_observations(source_ids)
+    assert relocations["groupby_col"].dtype == object
+
+    single = relocations[relocations["groupby_col"] == source_ids[-1]]
+    trajectory = ecoscope.base.Trajectory.from_relocations(single)
+    assert len(trajectory) == len(single) - 1
+
+
+def test_get_observations_shares_tcp_limit(mock_er_io, mock_er_server):
+    mock_er_io._get_observations(subject_ids=list(mock_er_server.observations))
+
+    pages = [params for _, path, params in mock_er_server.requests if path.endswith("observations/")]
+    # one count request per subject, then one request per page of 10 observations
+    assert len(pages) == 6 + (0 + 1 + 3 + 4 + 1 + 6)
+    assert 1 < mock_er_server.max_concurrency <= mock_er_io.tcp_limit
+
+
+def test_get_objects_for_ids_bounded(mock_er_io, mock_er_server):
+    pages = mock_er_io._get_objects_for_ids("observations/", "subject_id", ["subject-5"], {}, max_pending=2)
+    _id, results = next(pages)
+    assert _id == "subject-5"
+    assert len(results) == 10
+
+    # the count request, plus at most `max_pending` page requests scheduled ahead of the consumer
+    assert len(mock_er_server.requests) - 2 <= 1 + 3
+    assert sum(len(results) for _, results in pages) == 50
+
+
+def test_get_observations_time_partitioned(mock_er_io, mock_er_server):
+    observations = mock_er_io._get_observations(
+        subject_ids=["subject-2", "subject-3", "subject-5"],
+        since="2023-01-01T00:00:00+00:00",
+        until="2023-01-03T11:00:00+00:00",
+        observations_per_window=25,
+        adaptive_page_size=True,
+    )
+
+    assert observations.groupby("subject_id").size().to_dict() == {"subject-2": 25, "subject-3": 40, "subject-5": 60}
+    # the whole range of each subject is counted, then only the windows of the subjects split in several
+    counts = [params for _, path, params in mock_er_server.requests if params.get("page_size") == "1"]
+    assert len(counts) == 3 + 2 + 3
+    assert observations["id"].is_unique
+
+    windows = {
+        (params["subject_id"], params["since"])
+        for _, path, params in mock_er_server.requests
+        if path.endswith("observations/") and "page" in params
+    }
+    assert sum(subject_id == "subject-3" for subject_id, _ in windows) == 2
+    assert sum(subject_id == "subject-5" for subject_id, _ in windows) == 3
+
+
+def test_adaptive_page_size():
+    records = make_observations("subject-0", 100)
+    page_size = ecoscope.io.earthranger_utils.AdaptivePageSize(initial=1000, minimum=10, maximum=5000)
+
+    # 100 records in 0.01s would be 20000 in the 2s target, capped to the maximum
+    page_size.observe(records, 0.01)
+    assert page_size.size == 5000
+
+    page_size.observe(records, 10.0)
+    assert page_size.size == (5000 + 20) // 2
+
+    page_size = ecoscope.io.earthranger_utils.AdaptivePageSize(initial=1000, minimum=10, max_bytes=1000)
+    page_size.observe(records, 0.01)
+    assert page_size.size == 10
+
+
+def test_connection_reuse(mock_er_io, mock_er_server):
+    mock_er_io._get_observations(subject_ids=list(mock_er_server.observations))
+    stats = mock_er_io.get_connection_stats()
+
+    # the token and `user/me` requests of the login, the count and page requests
+    assert stats["requests"] == len(mock_er_server.requests)
+    assert stats["connections"] <= mock_er_io.tcp_limit
+    assert stats["reused"] == stats["requests"] - stats["connections"]
+
+
+def test_download_file_shares_session(mock_er_io, mock_er_server, tmp_path):
+    path = tmp_path / "patrol_types.json"
+    ecoscope.io.download_file(f"{mock_er_server.url}/api/v1.0/activity/patrols/types", path, session=mock_er_io.session)
+
+    assert json.loads(path.read_text())["data"] == mock_er_server.patrol_types
+    assert mock_er_io.get_connection_stats()["requests"] == len(mock_er_server.requests)
+
+
+def test_observation_store_sync(mock_er_io, mock_er_server, tmp_path):
+    subject_ids = ["subject-2", "subject-3"]
+    store = ecoscope.io.ObservationStore(mock_er_io, tmp_path)
+    assert store.sync(subject_ids) == {"subject-2": 25, "subject-3": 40}
+
+    mock_er_server.observations["subject-2"] = make_observations("subject-2", 30)
+    mock_er_server.requests.clear()
+    # the last stored observation is returned again by `created_after` and must be dropped
+    assert store.sync(subject_ids) == {"subject-2": 5, "subject-3": 0}
+    assert all("created_after" in params for _, path, params in mock_er_server.requests if "observations" in path)
+
+    relocations = ecoscope.io.ObservationStore(mock_er_io, tmp_path).load()
+    assert len(relocations) == 70
+    assert relocations.index.is_unique
+    assert relocations.groupby("groupby_col").size().to_dict() == {"subject-2": 30, "subject-3": 40}
+    assert store.state["subject-2"]["recorded_at"] == "2023-01-02T05:00:00+00:00"
+
+
+def test_get_patrol_observations_coalesced(mock_er_io, mock_er_server):
+    patrols = [
+        make_patrol(0, "subject-5", "2023-01-01T00:00:00+00:00", "2023-01-01T10:00:00+00:00"),
+        make_patrol(1, "subject-5", "2023-01-01T05:00:00+00:00", "2023-01-01T20:00:00+00:00"),
+        make_patrol(2, "subject-5", "2023-01-02T12:00:00+00:00", "2023-01-02T13:00:00+00:00"),
+        make_patrol(3, "subject-3", "2023-01-01T03:00:00+03:00", None),
+    ]
+    mock_er_server.requests.clear()
+    relocations = mock_er_io.get_patrol_observations(pd.DataFrame(patrols), include_patrol_details=True)
+
+    # the two overlapping windows of subject-5 are downloaded with a single query
+    queries = {
+        (params["subject_id"], params["since"], params.get("until"))
+        for _, path, params in mock_er_server.requests
+        if path.endswith("observations/")
+    }
+    assert len(queries) == 3
+
+    sizes = relocations.groupby("patrol_serial_number").size().to_dict()
+    assert sizes == {0: 11, 1: 16, 2: 2, 3: 40}
+    assert (relocations["patrol_type__value"] == "routine_patrol").all()
+
+
+def test_get_patrol_observations_failed_segment(mock_er_io, mock_er_server, caplog):
+    patrols = [
+        make_patrol(0, "subject-5", "2023-01-01T00:00:00+00:00", "2023-01-01T10:00:00+00:00"),
+        make_patrol(1, "subject-3", "2023-01-01T03:00:00+03:00", None),
+    ]
+    mock_er_server.fail_subjects = {"subject-5"}
+
+    # only the segment led by subject-5 is lost
+    relocations = mock_er_io.get_patrol_observations(pd.DataFrame(patrols), include_patrol_details=True)
+    assert relocations.groupby("patrol_serial_number").size().to_dict() == {1: 40}
+    assert "subject_id=subject-5" in caplog.text
+
+    assert mock_er_io.get_patrol_observations(pd.DataFrame(patrols[:1])).empty
+
+
+def test_coalesce_time_ranges():
+    ranges = [("a", 5, 8), ("b", 0, 1), ("a", 0, 3), ("a", 2, 6), ("a", 9, None), ("a", 10, 12)]
+    coalesced, membership = ecoscope.io.earthranger_utils.coalesce_time_ranges(ranges)
+    assert coalesced == [("a", 0, 8), ("a", 9, None), ("b", 0, 1)]
+    assert membership == [0, 2, 0, 0, 1, 1]
+
+
+def test_post_observations_bulk(mock_er_io, mock_er_server):
+    observations = gpd.GeoDataFrame(
+        {
+            "source": ["a"] * 25 + ["b"] * 5,
+            "recorded_at": pd.date_range("2023-01-01", periods=30, freq="h", tz="Africa/Nairobi"),
+            "speed": range(30),
+        },
+        geometry=gpd.points_from_xy(range(30), range(30)),
+        crs=4326,
+    )
+    mock_er_server.fail_posts = 2
+
+    report = mock_er_io.post_observations_bulk(observations, chunk_size=10, max_workers=2, backoff_factor=0.01)
+
+    assert report["size"].tolist() == [10, 10, 5, 5]
+    assert (report["status"] == "success").all()
+    assert report["attempts"].sum() == 4 + 2
+    assert len(mock_er_server.posted) == 30
+
+    posted = pd.DataFrame(mock_er_server.posted).sort_values("recorded_at")
+    assert posted["recorded_at"].iloc[0] == "2022-12-31T21:00:00.000000+00:00"
+    assert posted["location"].iloc[1] == {"longitude": 1.0, "latitude": 1.0}
+    assert posted["additional"].iloc[2] == {"speed": 2}
+
+
+def test_post_observations_bulk_report_failures(mock_er_io, mock_er_server):
+    observations = gpd.GeoDataFrame(
+        {"source": ["a"] * 3, "recorded_at": pd.date_range("2023-01-01", periods=3, freq="h", tz="UTC")},
+        geometry=gpd.points_from_xy(range(3), range(3)),
+        crs=4326,
+    )
+    mock_er_server.fail_posts = 10
+
+    report = mock_er_io.post_observations_bulk(observations, chunk_size=2, max_tries=2, backoff_factor=0.01)
+    assert report["status"].tolist() == ["failed", "failed"]
+    assert report["attempts"].tolist() == [2, 2]
+    assert observations.loc[np.concatenate(report["index"])].equals(observations)
+
+
+def test_metadata_cache_off_by_default(mock_er_io, mock_er_server):
+    def subject_requests():
+        return sum(path.endswith("subjects/") for _, path, _ in mock_er_server.requests)
+
+    assert mock_er_io.metadata_cache is None
+    mock_er_io.get_subjects()
+    first = subject_requests()
+    mock_er_io.get_subjects()
+    assert first > 0 and subject_requests() == 2 * first
+
+
+def test_metadata_cache(mock_er_server):
+    def type_requests():
+        return sum(path.endswith("activity/patrols/types") for _, path, _ in mock_er_server.requests)
+
+    mock_er_io = ecoscope.io.EarthRangerIO(
+        server=mock_er_server.url, username="mock", password="mock", discovery=False, metadata_cache_ttl=300
+    )
+    mock_er_io.get_patrol_types()
+    patrol_types = mock_er_io.get_patrol_types()
+    assert type_requests() == 1
+    assert (mock_er_io.metadata_cache.hits, mock_er_io.metadata_cache.misses) == (1, 1)
+
+    # cached values can't be altered through the returned objects
+    patrol_types["value"] = "changed"
+    assert (mock_er_io.get_patrol_types()["value"] == "routine_patrol").all()
+
+    mock_er_io.metadata_cache.invalidate("activity/patrols/types")
+    mock_er_io.get_patrol_types()
+    assert type_requests() == 2
+
+    # any write drops the cache
+    mock_er_io.post_observations_bulk(
+        gpd.GeoDataFrame(
+            {"source": ["a"], "recorded_at": [pd.Timestamp("2023-01-01", tz="UTC")]},
+            geometry=gpd.points_from_xy([0], [0]),
+        )
+    )
+    mock_er_io.get_patrol_types()
+    assert type_requests() == 3
+
+
+def test_metadata_cache_expiry():
+    cache = ecoscope.io.earthranger_utils.MetadataCache(maxsize=2, ttl=0.05)
+    for i in range(3):
+        cache.put(cache.make_key("subjects", params={"page": i}), [i])
+    assert len(cache) == 2
+    assert cache.get(cache.make_key("subjects", params={"page": 0})) is None
+    assert cache.get(cache.make_key("subjects", params={"page": 2})) == [2]
+    time.sleep(0.1)
+    assert cache.get(cache.make_key("subjects", params={"page": 2})) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_get_events(mock_er_io, mock_er_server):
+    mock_er_server.events = [
+        make_event(i, f"2023-01-01T{i:02d}:00:00+00:00", location=i % 3 != 0) for i in reversed(range(12))
+    ]
+    events = mock_er_io.get_events(since="2023-01-01T02:00:00+00:00")
+
+    assert len(events) == 10
+    assert events["time"].is_monotonic_increasing
+    assert events.crs == 4326
+    # the earliest event has no location
+    assert events.geometry.isna().tolist() == [i % 3 == 0 for i in range(2, 12)]
+
+
+def test_get_subjectgroup_observations(mock_er_io, mock_er_server):
+    mock_er_server.subjectgroups = {"herd": ["subject-2", "subject-4"]}
+    # without a time range or AOI, subjects aren't pruned on `tracks_available`
+    next(s for s in mock_er_server.subjects if s["id"] == "subject-4")["tracks_available"] = False
+    relocations = mock_er_io.get_subjectgroup_observations(subject_group_name="herd")
+
+    assert relocations.groupby("groupby_col").size().to_dict() == {"subject-2": 25, "subject-4": 7}
+
+
+def test_get_subjectgroup_observations_aoi(mock_er_io, mock_er_server):
+    # observation i of every subject is at (36 + i / 1000, 0.5 - i / 1000), hourly from 2023-01-01
+    mock_er_server.observations["subject-6"] = make_observations("subject-6", 15)
+    mock_er_server.subjects.append(
+        make_subject("subject-6", mock_er_server.observations["subject-6"][-1]["recorded_at"])
+    )
+    mock_er_server.subjectgroups = {"herd": list(mock_er_server.observations)}
+
+    aoi = shapely.box(36.0095, 0.4805, 36.0305, 0.4905)
+    relocations = mock_er_io.get_subjectgroup_observations(
+        subject_group_name="herd", aoi=aoi, since="2023-01-01T15:00:00+00:00"
+    )
+
+    # observations 15 to 19 are both in the time range and within the AOI, for the subjects having them
+    assert relocations.groupby("groupby_col").size().to_dict() == {"subject-2": 5, "subject-3": 5, "subject-5": 5}
+    # subjects 0, 1 and 4 have no track in the bounding box, and subject 6 no position since the start of the range
+    queried = {params["subject_id"] for _, path, params in mock_er_server.requests if path.endswith("observations/")}
+    assert queried == {"subject-2", "subject-3", "subject-5"}
+
+
+def test_points_within():
+    points = gpd.GeoSeries.from_xy([0.5, 1.5, 2.5, 1.0, np.nan], [0.5, 0.5, 0.5, 1.0, np.nan])
+    aoi = gpd.GeoSeries([shapely.box(0, 0, 1, 1), shapely.box(2, 0, 3, 1)], crs=4326)
+
+    assert ecoscope.io.earthranger_utils.points_within(points.values, aoi).tolist() == [True, False, True, True, False]
+    assert ecoscope.io.earthranger_utils.aoi_bbox(aoi) == "0.0,0.0,3.0,1.0"
+
+
+def test_get_observations_checkpoint(mock_er_io, mock_er_server, tmp_path):
+    subject_ids = ["subject-2", "subject-3", "subject-5"]
+    until = "2023-01-05T00:00:00+00:00"
+    # without an `until`, the queries of a rerun wouldn't match those saved
+    with pytest.raises(ValueError):
+        mock_er_io.get_subject_observations(subject_ids, checkpoint=tmp_path)
+
+    mock_er_server.fail_subjects = {"subject-5"}
+    with pytest.raises(ERClientPermissionDenied):
+        mock_er_io.get_subject_observations(subject_ids, until=until, checkpoint=tmp_path)
+
+    checkpoint = ecoscope.io.DownloadCheckpoint(tmp_path)
+    saved = {entry["params"]["subject_id"] for entry in checkpoint.manifest.values()}
+    assert "subject-5" not in saved
+
+    mock_er_server.fail_subjects = set()
+    mock_er_server.requests.clear()
+    relocations = mock_er_io.get_subject_observations(subject_ids, until=until, checkpoint=tmp_path)
+
+    assert relocations.groupby("groupby_col").size().to_dict() == {"subject-2": 25, "subject-3": 40, "subject-5": 60}
+    queried = {params["subject_id"] for _, path, params in mock_er_server.requests if path.endswith("observations/")}
+    assert queried == set(subject_ids) - saved
+    assert {entry["rows"] for entry in ecoscope.io.DownloadCheckpoint(tmp_path).manifest.values()} == {25, 40, 60}
+
+
+def test_get_events_checkpoint(mock_er_io, mock_er_server, tmp_path):
+    mock_er_server.events = [
+        make_event(i, f"2023-01-{i // 24 + 1:02d}T{i % 24:02d}:00:00+00:00", location=i % 3 != 0) for i in range(48)
+    ]
+    # without an `until`, a rerun would return the saved events up to the end of the first run
+    with pytest.raises(ValueError):
+        mock_er_io.get_events(since="2023-01-01T00:00:00+00:00", checkpoint=tmp_path)
+
+    kwargs = dict(since="2023-01-01T00:00:00+00:00", until="2023-01-02T23:00:00+00:00", window="12h")
+    events = mock_er_io.get_events(checkpoint=tmp_path, **kwargs)
+    assert len(events) == 48
+    assert len(ecoscope.io.DownloadCheckpoint(tmp_path)) == 4
+
+    mock_er_server.requests.clear()
+    pd.testing.assert_frame_equal(mock_er_io.get_events(checkpoint=tmp_path, **kwargs), events)
+    assert not [path for _, path, _ in mock_er_server.requests if "events" in path]
+
+
+def test_async_backend(mock_er_io, mock_er_server):
+    er_io = ecoscope.io.EarthRangerIO(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        tcp_limit=3,
+        sub_page_size=10,
+        backend="async",
+    )
+    try:
+        subject_ids = list(mock_er_server.observations)
+        mock_er_server.max_concurrency = 0
+        relocations = er_io.get_subject_observations(subject_ids)
+        # observations recorded at the same time come in the order their pages were received
+        pd.testing.assert_frame_equal(
+            relocations.sort_index(), mock_er_io.get_subject_observations(subject_ids).sort_index()
+        )
+        assert 1 < mock_er_server.max_concurrency <= 4
+        assert er_io._async_io.get_request_latency_stats()["count"] == 6 + 15
+    finally:
+        er_io.close()
+
+
+def test_mock_server_replay(tmp_path):
+    server = MockERServer.synthetic(subjects=3, observations_per_subject=5, events=4, patrols=2)
+    server.save(tmp_path / "recording.json")
+
+    with MockERServer.load(tmp_path / "recording.json", max_page_size=2) as replay:
+        er_io = ecoscope.io.EarthRangerIO(
+            server=replay.url, username="mock", password="mock", discovery=False, sub_page_size=2
+        )
+        assert len(er_io.get_subject_observations(["subject-0", "subject-2"])) == 10
+        assert len(er_io.get_events()) == 4
+        assert len(er_io.get_patrols()) == 2
+
+
+def test_telemetry(mock_er_server):
+    events = []
+    telemetry = ecoscope.io.Telemetry(callback=events.append)
+    er_io = ecoscope.io.EarthRangerIO(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        tcp_limit=3,
+        sub_page_size=10,
+        telemetry=telemetry,
+    )
+    relocations = er_io.get_subject_observations(list(mock_er_server.observations))
+    summary = telemetry.summary()
+
+    assert list(summary.index) == ["request", "decode", "page", "parse", "to_gdf", "merge_details", "relocations"]
+    assert summary.loc["request", "calls"] == len(mock_er_server.requests)
+    assert summary.loc["request", "bytes"] > 0
+    # one page of at most 10 observations per page request
+    assert summary.loc["page", "pages"] == summary.loc["parse", "calls"] == 15
+    assert summary.loc["page", "rows"] == summary.loc["parse", "rows"] == len(relocations) == 133
+    assert summary.loc["relocations", "rows"] == 133
+    assert summary["seconds"].gt(0).all()
+
+    assert len(events) == summary["calls"].sum()
+    assert all(event["seconds"] >= 0 for event in events)
+
+    telemetry.reset()
+    assert telemetry.summary().empty
+
+
+def test_telemetry_async_backend(mock_er_server):
+    mock_er_server.events = [make_event(i, f"2023-01-01T{i:02d}:00:00+00:00") for i in range(12)]
+    telemetry = ecoscope.io.Telemetry()
+    er_io = ecoscope.io.EarthRangerIO(
+        server=mock_er_server.url,
+        username="mock",
+        password="mock",
+        discovery=False,
+        sub_page_size=10,
+        backend="async",
+        telemetry=telemetry,
+    )
+    try:
+        events = er_io.get_events()
+    finally:
+        er_io.close()
+    summary = telemetry.summary()
+
+    # the logins of both transports, the count and page requests
+    assert summary.loc["request", "calls"] == len(mock_er_server.requests)
+    assert summary.loc["page", "rows"] == summary.loc["parse", "rows"] == len(events) == 12
+    assert {"clean_time_cols", "to_gdf"} <= set(summary.index)
@@ -1,9 +1,20 @@
 import pytest
 
+import geopandas as gpd
 import numpy as np
 import pandas as pd
+import shapely
 
-from ecoscope.io.earthranger_utils import clean_time_cols
+from ecoscope.io.earthranger_utils import (
+    clean_time_cols,
+    concat_observation_columns,
+    dataframe_to_dict,
+    flatten_records,
+    geojson_to_geometry,
+    observations_to_columns,
+    pack_columns,
+    to_gdf,
+)
 
 
 @pytest.fixture
@@ -51,3 +62,153 @@ def test_clean_time_cols(df_with_times):
     # check the nan separately from the array equality
     assert np.array_equal(expected_times, cleaned["time"].array[:-1])
     assert pd.isnull(cleaned["time"]["H"])
+
+
+def test_clean_time_cols_fallback():
+    df = pd.DataFrame({"created_at": ["2023-09-27T06:16:46Z", "Sep 27 2023 10:00 PM", None]})
+    cleaned = clean_time_cols(df)
+    assert list(cleaned["created_at"][:2]) == [
+        pd.Timestamp("2023-09-27 06:16:46", tz="UTC"),
+        pd.Timestamp("2023-09-27 22:00:00", tz="UTC"),
+    ]
+    assert pd.isnull(cleaned["created_at"][2])
+
+
+def test_observation_columns():
+    page_1 = [
+        {
+            "id": "a",
+            "location": {"longitude": 36.5, "latitude": -1.25},
+            "recorded_at": "2023-09-27T06:16:46.23-07:00",
+            "source": "s1",
+            "exclusion_flags": 0,
+        },
+        {"id": "b", "location": None, "recorded_at": None, "source": "s2", "exclusion_flags": 2},
+    ]
+    page_2 = [{"id": "c", "location": {"longitude": 37, "latitude": 1}, "recorded_at": "2023-09-28T00:00:00Z"}]
+
+    batch = observations_to_columns(page_1, subject_id="x")
+    assert batch["recorded_at"].dtype == np.int64
+    assert batch["longitude"].dtype == np.float64
+    assert list(batch["subject_id"]) == ["x", "x"]
+
+    gdf = concat_observation_columns([batch, observations_to_columns(page_2, subject_id="y"), {}])
+    assert list(gdf["id"]) == ["a", "b", "c"]
+    assert gdf["source"].dtype == object
+    assert gdf["exclusion_flags"].isna().tolist() == [False, False, True]
+    assert list(gdf["recorded_at"]) == [
+        pd.Timestamp("2023-09-27 13:16:46.23", tz="UTC"),
+        pd.NaT,
+        pd.Timestamp("2023-09-28", tz="UTC"),
+    ]
+    assert gdf.geometry.x.tolist()[::2] == [36.5, 37.0]
+    assert gdf.geometry.iloc[1].is_empty or np.isnan(gdf.geometry.iloc[1].x)
+    assert list(gdf.columns[:3]) == ["id", "location", "recorded_at"]
+    assert gdf["location"].tolist() == [
+        {"longitude": 36.5, "latitude": -1.25},
+        None,
+        {"longitude": 37.0, "latitude": 1.0},
+    ]
+    assert list(gdf["location"].iloc[0]) == ["longitude", "latitude"]
+
+
+def test_geojson_to_geometry():
+    polygon = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
+    values = pd.Series(
+        [
+            None,
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [36.5, 0.25]}, "properties": {}},
+            {"type": "Feature", "geometry": None, "properties": {}},
+            {"type": "Feature", "geometry": polygon, "properties": {}},
+            {"type": "Point", "coordinates": [1.0, 2.0]},
+            np.nan,
+        ],
+        index=list("abcdef"),
+    )
+
+    geometry = geojson_to_geometry(values)
+    assert geometry.crs == 4326
+    assert list(geometry.index) == list("abcdef")
+    assert geometry.isna().tolist() == [True, False, True, False, False, True]
+    assert geometry["b"].equals(shapely.Point(36.5, 0.25))
+    assert geometry["d"].equals(shapely.geometry.shape(polygon))
+    assert geometry["e"].equals(shapely.Point(1.0, 2.0))
+
+
+def test_flatten_records():
+    records = pd.Series(
+        [
+            {"species": "elephant", "count": 3, "alive": True, "herd": {"size": 1.5, "tags": ["a"]}},
+            None,
+            {"species": "lion", "count": 2, "alive": False, "herd": {"size": 4}},
+        ],
+        index=[10, 11, 12],
+    )
+
+    df = flatten_records(records, prefix="event_details", index=records.index)
+    expected = pd.json_normalize([r or {} for r in records], sep="__").add_prefix("event_details__")
+    expected.index = records.index
+    pd.testing.assert_frame_equal(df, expected, check_like=True)
+
+    complete = flatten_records(records.dropna())
+    assert complete["count"].dtype == np.int64
+    assert complete["alive"].dtype == bool
+    assert complete["herd__size"].dtype == np.float64
+
+
+def test_pack_columns():
+    df = pd.DataFrame(
+        {
+            "source": ["s1", "s2"],
+            "recorded_at": pd.to_datetime(["2023-01-01T03:00:00+03:00", None], utc=True).tz_convert("Africa/Nairobi"),
+            "speed": [1.5, np.nan],
+            "count": [1, 2],
+            "label": pd.Categorical(["a", None]),
+        }
+    )
+
+    packed = pack_columns(df.copy(), columns=["source"])
+    assert list(packed.columns) == ["source", "additional"]
+    assert packed["additional"].tolist() == [
+        {"recorded_at": "2023-01-01T00:00:00.000000+00:00", "speed": 1.5, "count": 1, "label": "a"},
+        {"recorded_at": None, "speed": None, "count": 2, "label": None},
+    ]
+    assert type(packed["additional"][0]["count"]) is int
+
+
+def test_to_gdf():
+    df = pd.DataFrame(
+        {
+            "id": ["a", "b", "c", "d"],
+            "location": [None, {"longitude": 36.5, "latitude": 0.25}, [37.0, -1.0], {"longitude": None}],
+        }
+    )
+
+    gdf = to_gdf(df)
+    assert gdf.crs == 4326
+    np.testing.assert_array_equal(gdf.geometry.x.to_numpy(), [np.nan, 36.5, 37.0, np.nan])
+    np.testing.assert_array_equal(gdf.geometry.y.to_numpy(), [np.nan, 0.25, -1.0, np.nan])
+
+
+def test_dataframe_to_dict():
+    events = gpd.GeoDataFrame(
+        {
+            "event_type": ["arrest_rep", "fire_rep"],
+            "time": pd.to_datetime(["2023-01-01T00:00:00Z", "2023-01-02T00:00:00Z"]),
+            "priority": [200, np.nan],
+        },
+        geometry=[shapely.Point(36.5, 0.25), None],
+        crs=4326,
+    )
+
+    assert dataframe_to_dict(events) == [
+        {
+            "event_type": "arrest_rep",
+            "time": "2023-01-01T00:00:00.000000+00:00",
+            "priority": 200.0,
+            "location": {"longitude": 36.5, "latitude": 0.25},
+        },
+        {"event_type": "fire_rep", "time": "2023-01-02T00:00:00.000000+00:00", "priority": None, "location": None},
+    ]
+    # the input isn't modified
+    assert list(events.columns) == ["event_type", "time", "priority", "geometry"]
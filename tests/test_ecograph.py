@@ -6,7 +6,7 @@ import pytest
 import sklearn.preprocessing
 
 import ecoscope
-from ecoscope.analysis.ecograph import Ecograph, get_feature_gdf
+from ecoscope.analysis.ecograph import Ecograph, EcographCache, get_feature_gdf
 
 
 @pytest.fixture
@@ -98,3 +98,76 @@ def test_ecograph_to_csv(movebank_ecograph):
         assert item in feat.columns
 
     assert len(movebank_ecograph.graphs["Salif Keita"]) == len(feat)
+
+
+def test_ecograph_sampled_betweenness(movebank_trajectory_gdf):
+    trajectory = movebank_trajectory_gdf[movebank_trajectory_gdf["groupby_col"] == "Salif Keita"].iloc[:1000]
+    exact = Ecograph(trajectory.copy(), resolution=500)
+    sampled = Ecograph(
+        trajectory.copy(), resolution=500, betweenness_samples=60, betweenness_chunks=4, seed=1, n_jobs=2
+    )
+
+    assert "betweenness_stderr" in sampled.features
+    G_exact, G_sampled = exact.graphs["Salif Keita"], sampled.graphs["Salif Keita"]
+    assert set(G_exact.nodes()) == set(G_sampled.nodes())
+
+    btw_exact = np.array([G_exact.nodes[n]["betweenness"] for n in G_exact.nodes()])
+    btw_sampled = np.array([G_sampled.nodes[n]["betweenness"] for n in G_exact.nodes()])
+    btw_err = np.array([G_sampled.nodes[n]["betweenness_stderr"] for n in G_exact.nodes()])
+    assert np.all(btw_err >= 0)
+    assert np.corrcoef(btw_exact, btw_sampled)[0, 1] > 0.9
+
+    with pytest.raises(ValueError):
+        Ecograph(trajectory.copy(), resolution=500, cutoff=3, betweenness_samples=40)
+
+
+def test_ecograph_pyramid(movebank_trajectory_gdf):
+    trajectory = movebank_trajectory_gdf[movebank_trajectory_gdf["groupby_col"] == "Salif Keita"].iloc[:1000]
+    pyramid = Ecograph.pyramid(trajectory.copy(), resolutions=[500, 1250, 5000])
+    assert list(pyramid.keys()) == [500, 1250, 5000]
+    assert len(pyramid[500].graphs["Salif Keita"]) > len(pyramid[5000].graphs["Salif Keita"])
+
+    direct = Ecograph(trajectory.copy(), resolution=1250)
+    G_direct, G_derived = direct.graphs["Salif Keita"], pyramid[1250].graphs["Salif Keita"]
+    assert (direct.n_rows, direct.n_cols) == (pyramid[1250].n_rows, pyramid[1250].n_cols)
+    assert set(G_direct.edges()) == set(G_derived.edges())
+    for node in G_direct.nodes():
+        for feature in direct.features:
+            np.testing.assert_equal(G_direct.nodes[node][feature], G_derived.nodes[node][feature])
+
+
+def test_ecograph_cache(movebank_trajectory_gdf, tmp_path):
+    trajectory = movebank_trajectory_gdf.iloc[:300]
+    cache = EcographCache(maxsize=1, cache_dir=tmp_path)
+    computed = Ecograph(trajectory.copy(), resolution=1000, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    Ecograph(trajectory.copy(), resolution=1000, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Entries are read back from disk by a fresh cache, changed parameters are recomputed
+    disk_cache = EcographCache(cache_dir=tmp_path)
+    cached = Ecograph(trajectory.copy(), resolution=1000, cache=disk_cache)
+    Ecograph(trajectory.copy(), resolution=1000, radius=3, cache=disk_cache)
+    assert (disk_cache.hits, disk_cache.misses) == (1, 1)
+
+    for subject, G in computed.graphs.items():
+        assert list(G.nodes(data=True)) == list(cached.graphs[subject].nodes(data=True))
+        assert list(G.edges()) == list(cached.graphs[subject].edges())
+
+
+def test_ecograph_cache_sampled_betweenness(movebank_trajectory_gdf):
+    trajectory = movebank_trajectory_gdf.iloc[:300]
+    n = trajectory["groupby_col"].nunique()
+    cache = EcographCache()
+    sampled = dict(resolution=1000, betweenness_samples=5, betweenness_chunks=2)
+
+    Ecograph(trajectory.copy(), seed=1, cache=cache, **sampled)
+    Ecograph(trajectory.copy(), seed=2, cache=cache, **sampled)
+    assert (cache.hits, cache.misses) == (0, 2 * n)
+    Ecograph(trajectory.copy(), seed=2, cache=cache, **sampled)
+    assert (cache.hits, cache.misses) == (n, 2 * n)
+
+    # unseeded samples aren't reproducible, so they are neither read from nor written to the cache
+    Ecograph(trajectory.copy(), seed=None, cache=cache, **sampled)
+    assert (cache.hits, cache.misses, len(cache._entries)) == (n, 2 * n, 2 * n)
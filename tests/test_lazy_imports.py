@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+import pytest
+
+import ecoscope
+
+
+@pytest.mark.parametrize("module", ["ecoscope", "ecoscope.base"])
+def test_import_is_lazy(module):
+    statement = (
+        f"import sys, {module}; "
+        "print(','.join(m for m in ('ecoscope.io', 'ecoscope.base.base', 'geopandas', 'ee') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", statement], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_lazy_attributes():
+    assert ecoscope.base.Relocations is ecoscope.base.base.Relocations
+    assert ecoscope.io.EarthRangerIO is ecoscope.io.earthranger.EarthRangerIO
+    assert ecoscope.analysis.calculate_feature_density is ecoscope.analysis.feature_density.calculate_feature_density
+    assert "EarthRangerIO" in dir(ecoscope.io)
+    with pytest.raises(AttributeError, match="has no attribute 'missing'"):
+        ecoscope.io.missing
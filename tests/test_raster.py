@@ -0,0 +1,24 @@
+import numpy as np
+
+from ecoscope.io.raster import raster_to_gdf
+
+
+def test_raster_to_gdf():
+    gdf = raster_to_gdf("tests/sample_data/raster/uint8.tif")
+    assert list(gdf.columns) == ["geometry", "value"]
+    assert gdf.geometry.is_valid.all()
+    assert gdf["value"].notna().all()
+
+
+def test_raster_to_gdf_as_cells():
+    shapes_gdf = raster_to_gdf("tests/sample_data/raster/uint8.tif")
+    cells_gdf = raster_to_gdf("tests/sample_data/raster/uint8.tif", as_cells=True)
+
+    assert len(cells_gdf) >= len(shapes_gdf)
+    assert cells_gdf.crs == shapes_gdf.crs
+    assert np.isclose(cells_gdf.area.sum(), shapes_gdf.area.sum())
+    for value in shapes_gdf["value"].unique():
+        assert np.isclose(
+            cells_gdf.loc[cells_gdf["value"] == value].area.sum(),
+            shapes_gdf.loc[shapes_gdf["value"] == value].area.sum(),
+        )